@@ -1,12 +1,19 @@
-from flask import Flask, jsonify, request, send_from_directory
+import json
+import os
+# Storage profile for this process; must be set before src.database is imported
+os.environ.setdefault('DB_PROFILE', 'api')
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
-from src.database import Lead, LeadStatus, get_session
-from src.agent import generate_personalized_email, get_email_body
+from src.database import Lead, LeadStatus, get_session, leads_in_status_query
+from src.agent import generate_personalized_email, generate_personalized_emails, iter_personalized_emails, get_email_body
 from src.mailer import send_outreach_email
 from src.scheduler import run_scheduler as run_followup_scheduler
-from src.secrets_loader import get_secret
+from src.analytics import get_analytics_summary
+from src.jobs import submit_job, get_job, list_jobs, recover_jobs_once
+from src.ratelimit import send_governor
+from src.metrics import render_metrics
+from src.scraper import SERP_PAGE_LIMIT
 import streamlit as st
-import os
 
 app = Flask(__name__, static_folder='static')
 CORS(app)  # Enable CORS for development
@@ -26,26 +33,78 @@ def serve_static(path):
 
 # ===== API Endpoints =====
 
+# Fields clients may request through /api/leads?fields=
+LEAD_FIELDS = ['id', 'clinic_name', 'website', 'email', 'name', 'phone', 'status',
+               'follow_up_count', 'last_contacted', 'created_at']
+DEFAULT_LEAD_FIELDS = ['id', 'clinic_name', 'website', 'email', 'name', 'status',
+                       'follow_up_count', 'last_contacted']
+LEADS_PAGE_SIZE = 100
+LEADS_MAX_PAGE_SIZE = 500
+
+def _resolve_status(value):
+    """Accept a LeadStatus name ('ENRICHED') or value ('Enriched')"""
+    for status in LeadStatus:
+        if value.upper() in (status.name, status.value.upper()):
+            return status.value
+    return None
+
 @app.route('/api/leads', methods=['GET'])
 def get_leads():
-    """Get all leads"""
+    """
+    Get one page of leads, ordered by id.
+
+    Query params: after (cursor id), limit, status, q (search),
+    fields (comma separated). Responses carry an ETag so an unchanged
+    page is answered with 304.
+    """
     try:
+        after = request.args.get('after', type=int)
+        limit = min(max(request.args.get('limit', LEADS_PAGE_SIZE, type=int), 1), LEADS_MAX_PAGE_SIZE)
+        
+        fields = DEFAULT_LEAD_FIELDS
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+            unknown = [f for f in fields if f not in LEAD_FIELDS]
+            if unknown:
+                return jsonify({'success': False, 'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        columns = ['id'] + [f for f in fields if f != 'id']
+        
         session = get_session()
-        leads = session.query(Lead).all()
+        query = session.query(*[getattr(Lead, f) for f in columns])
         
-        leads_data = [{
-            'id': lead.id,
-            'clinic_name': lead.clinic_name,
-            'website': lead.website,
-            'email': lead.email,
-            'name': lead.name,
-            'status': lead.status,
-            'follow_up_count': lead.follow_up_count,
-            'last_contacted': lead.last_contacted.isoformat() if lead.last_contacted else None
-        } for lead in leads]
+        if request.args.get('status'):
+            status = _resolve_status(request.args['status'])
+            if status is None:
+                session.close()
+                return jsonify({'success': False, 'error': 'Unknown status'}), 400
+            query = query.filter(Lead.status == status)
         
+        search = request.args.get('q', '').strip()
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(
+                Lead.clinic_name.ilike(pattern) | Lead.email.ilike(pattern) |
+                Lead.website.ilike(pattern) | Lead.name.ilike(pattern)
+            )
+        
+        if after is not None:
+            query = query.filter(Lead.id > after)
+        rows = query.order_by(Lead.id).limit(limit).all()
         session.close()
-        return jsonify({'success': True, 'leads': leads_data})
+        
+        leads_data = []
+        for row in rows:
+            item = {}
+            for field, value in zip(columns, row):
+                if field in fields:
+                    item[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+            leads_data.append(item)
+        
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        response = jsonify({'success': True, 'leads': leads_data, 'next_cursor': next_cursor})
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error fetching leads: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -68,7 +127,7 @@ def preview_email():
             return jsonify({'success': False, 'error': 'Lead not found'}), 404
         
         # Generate personalized email
-        opening = generate_personalized_email(lead.name, lead.clinic_name)
+        opening = generate_personalized_email(lead.name, lead.clinic_name, lead_id=lead.id)
         subject = f"Question for {lead.clinic_name}"
         body = get_email_body(lead, opening)
         
@@ -101,31 +160,68 @@ def send_email():
         print(f"Error sending email: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _preview_record(lead, opening):
+    return {
+        'subject': f"Question for {lead.clinic_name}",
+        'body': get_email_body(lead, opening),
+        'lead': {
+            'id': lead.id,
+            'clinic_name': lead.clinic_name,
+            'email': lead.email,
+            'name': lead.name
+        }
+    }
+
+def _stream_previews(leads):
+    """
+    NDJSON lines: a header with the total, one line per lead, then a summary.
+
+    A lead that fails gets a {"lead_id", "error"} line instead of a preview.
+    The summary line is always last, so a stream without one was cut off.
+    """
+    yield json.dumps({'total': len(leads)}) + '\n'
+    count = failed = 0
+    try:
+        # Closing this generator on client disconnect stops pending generation
+        for lead, opening, error in iter_personalized_emails(leads):
+            if error is None:
+                try:
+                    line = json.dumps({'lead_id': lead.id, **_preview_record(lead, opening)})
+                except Exception as e:
+                    error = e
+            if error is None:
+                count += 1
+            else:
+                print(f"Error generating preview for lead {lead.id}: {error}")
+                line = json.dumps({'lead_id': lead.id, 'error': str(error)})
+                failed += 1
+            yield line + '\n'
+    except Exception as e:
+        print(f"Error streaming bulk preview: {e}")
+        yield json.dumps({'done': False, 'count': count, 'failed': failed, 'error': str(e)}) + '\n'
+        return
+    yield json.dumps({'done': True, 'count': count, 'failed': failed}) + '\n'
+
 @app.route('/api/bulk-preview', methods=['POST'])
 def bulk_preview():
-    """Generate email previews for all enriched leads"""
+    """
+    Generate email previews for all enriched leads.
+
+    With ?stream=1 previews are streamed as NDJSON as soon as each one is
+    generated instead of returned in one response at the end.
+    """
     try:
         session = get_session()
-        leads = session.query(Lead).filter_by(status=LeadStatus.ENRICHED.value).all()
-        
-        previews = {}
-        for lead in leads:
-            opening = generate_personalized_email(lead.name, lead.clinic_name)
-            subject = f"Question for {lead.clinic_name}"
-            body = get_email_body(lead, opening)
-            
-            previews[lead.id] = {
-                'subject': subject,
-                'body': body,
-                'lead': {
-                    'id': lead.id,
-                    'clinic_name': lead.clinic_name,
-                    'email': lead.email,
-                    'name': lead.name
-                }
-            }
-        
+        leads = session.scalars(leads_in_status_query(LeadStatus.ENRICHED.value)).all()
         session.close()
+        
+        if request.args.get('stream') in ('1', 'true'):
+            return Response(stream_with_context(_stream_previews(leads)),
+                            mimetype='application/x-ndjson',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+        openings = generate_personalized_emails(leads)
+        previews = {lead.id: _preview_record(lead, openings[lead.id]) for lead in leads}
         return jsonify({'success': True, 'previews': previews})
     except Exception as e:
         print(f"Error generating bulk preview: {e}")
@@ -133,7 +229,7 @@ def bulk_preview():
 
 @app.route('/api/bulk-send', methods=['POST'])
 def bulk_send():
-    """Send emails to multiple leads"""
+    """Queue a background job that emails multiple leads"""
     try:
         data = request.json
         lead_ids = data.get('lead_ids', [])
@@ -141,30 +237,8 @@ def bulk_send():
         if not lead_ids:
             return jsonify({'success': False, 'error': 'No leads selected'}), 400
         
-        session = get_session()
-        sent_count = 0
-        failed_count = 0
-        
-        for lead_id in lead_ids:
-            lead = session.query(Lead).filter_by(id=lead_id).first()
-            if lead:
-                # Generate email
-                opening = generate_personalized_email(lead.name, lead.clinic_name)
-                subject = f"Question for {lead.clinic_name}"
-                body = get_email_body(lead, opening)
-                
-                # Send email
-                if send_outreach_email(lead_id, subject, body):
-                    sent_count += 1
-                else:
-                    failed_count += 1
-        
-        session.close()
-        return jsonify({
-            'success': True,
-            'sent': sent_count,
-            'failed': failed_count
-        })
+        job_id = submit_job('bulk_send', {'lead_ids': lead_ids})
+        return jsonify({'success': True, 'job_id': job_id}), 202
     except Exception as e:
         print(f"Error sending bulk emails: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -179,64 +253,100 @@ def run_scheduler():
         print(f"Error running scheduler: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _is_string_list(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(v, str) and v.strip() for v in value)
+
 @app.route('/api/run-scraper', methods=['POST'])
 def run_scraper():
-    """Run Google Maps scraper and enrichment"""
+    """
+    Queue a background job for Google Maps scraping and enrichment.
+
+    Takes `query` or a `queries` list, optional `locations` to cross them
+    with, and `max_pages` of results to follow per query (1 unless given;
+    each extra page costs one SerpAPI request per search).
+    """
     try:
-        data = request.json
+        data = request.get_json(silent=True) or {}
         query = data.get('query')
+        queries = data.get('queries') or ([query] if query else [])
         
-        if not query:
+        if not queries:
             return jsonify({'success': False, 'error': 'Query required'}), 400
-            
-        api_key = get_secret("SERP_API_KEY")
-        from src.scraper import process_scraping_job, enrich_leads
-        
-        # Run scraper
-        new_leads = process_scraping_job(query, api_key)
-        
-        # Run enrichment
-        enriched = enrich_leads()
+        if not _is_string_list(queries):
+            return jsonify({'success': False,
+                            'error': 'queries must be a non-empty list of non-empty strings'}), 400
         
-        return jsonify({
-            'success': True,
-            'count': new_leads,
-            'enriched': enriched
-        })
+        params = {'queries': queries}
+        if 'locations' in data:
+            if not _is_string_list(data['locations']):
+                return jsonify({'success': False,
+                                'error': 'locations must be a non-empty list of non-empty strings'}), 400
+            params['locations'] = data['locations']
+        if 'max_pages' in data:
+            try:
+                max_pages = int(data['max_pages'])
+            except (TypeError, ValueError):
+                max_pages = 0
+            if not 1 <= max_pages <= SERP_PAGE_LIMIT:
+                return jsonify({'success': False,
+                                'error': f'max_pages must be an integer from 1 to {SERP_PAGE_LIMIT}'}), 400
+            params['max_pages'] = max_pages
+        if data.get('refresh'):
+            params['refresh'] = True
+        job_id = submit_job('scrape', params)
+        return jsonify({'success': True, 'job_id': job_id}), 202
     except Exception as e:
         print(f"Error running scraper: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/send-rate', methods=['GET'])
+def get_send_rate():
+    """Live send throughput and queue depth from the rate governor"""
+    return jsonify({'success': True, 'send_rate': send_governor.metrics()})
+
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """List recent background jobs"""
+    try:
+        return jsonify({'success': True, 'jobs': list_jobs()})
+    except Exception as e:
+        print(f"Error listing jobs: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get progress, ETA and errors for a background job"""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, 'job': job})
+    except Exception as e:
+        print(f"Error fetching job: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Pipeline stage latencies, outcome counters and queue depths in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/analytics', methods=['GET'])
 def get_analytics():
-    """Get analytics data"""
+    """Get analytics data (aggregated in SQL, cached briefly)"""
     try:
-        session = get_session()
-        leads = session.query(Lead).all()
-        
-        # Status counts
-        status_counts = {}
-        for lead in leads:
-            status_counts[lead.status] = status_counts.get(lead.status, 0) + 1
-            
-        # Daily stats (mocked data based on last_contacted for demo)
-        # In a real app, you'd query a separate event log table
-        daily_stats = {
-            'sent': [0]*7,
-            'opened': [0]*7
-        }
-        
-        session.close()
-        return jsonify({
-            'success': True,
-            'status_counts': status_counts,
-            'daily_stats': daily_stats
-        })
+        days = min(max(request.args.get('days', 7, type=int), 1), 90)
+        return jsonify({'success': True, **get_analytics_summary(days)})
     except Exception as e:
         print(f"Error fetching analytics: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ===== Run Server =====
+# Resume queued jobs once per serving process, whatever server runs the app.
+# Under `python api.py` the debug reloader's watcher process never serves
+# requests, so only its child (WERKZEUG_RUN_MAIN) recovers.
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    recover_jobs_once()
+
 if __name__ == '__main__':
     print("🚀 Starting Lead Generation API Server...")
     print("📊 Dashboard: http://localhost:5000")
@@ -1,21 +1,14 @@
 import streamlit as st
 from src.ui_styles import apply_ios_style
 import pandas as pd
-from src.database import Lead, get_session
-from sqlalchemy import func
+from src.ui_data import status_counts, recent_leads
 
 st.set_page_config(page_title="Outreach Engine Dashboard", layout="wide")
 apply_ios_style()
 
 st.title("🚀 Lead Gen & Outreach Engine")
 
-def get_stats():
-    session = get_session()
-    stats = session.query(Lead.status, func.count(Lead.id)).group_by(Lead.status).all()
-    session.close()
-    return dict(stats)
-
-stats = get_stats()
+stats = status_counts()
 
 st.subheader("High-Level Overview")
 cols = st.columns(len(stats) if stats else 1)
@@ -29,19 +22,17 @@ else:
 st.divider()
 
 st.subheader("Recent Activity")
-session = get_session()
-recent_leads = session.query(Lead).order_by(Lead.created_at.desc()).limit(10).all()
-if recent_leads:
+recent = recent_leads(10)
+if recent:
     df = pd.DataFrame([{
         "Clinic Name": l.clinic_name,
         "Status": l.status,
         "Email": l.email,
         "Last Contacted": l.last_contacted,
         "Created At": l.created_at
-    } for l in recent_leads])
+    } for l in recent])
     st.table(df)
 else:
     st.write("No recent activity.")
-session.close()
 
 st.sidebar.success("Select a page above.")
@@ -0,0 +1,168 @@
+"""
+Email extraction benchmark.
+
+Runs the ranked extractor and the old first-regex-match approach over the
+labelled pages in bench/email_corpus and prints precision, recall and
+pages/sec for each, then times the ranked extractor on generated
+pathological pages that make backtracking patterns go quadratic (the legacy
+pattern takes minutes on them, so it is not timed there).
+
+Pages are scored per set. "tuning" pages are the snippets the scoring rules
+were written against, so they only guard against regressions. "holdout"
+pages are full pages with real template noise (scripts, JSON blobs, forms,
+footers) that are labelled by what a person would pick, never by what the
+extractor returns; don't change the rules to fit them. Save real contact
+pages into the holdout set with --save.
+
+    python bench/email_extraction.py [--repeat 200] [--verbose]
+    python bench/email_extraction.py --save URL --expected EMAIL   # EMAIL may be "none"
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.email_extractor import best_email
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_corpus')
+LABELS_PATH = os.path.join(CORPUS_DIR, 'labels.json')
+CORPUS_SETS = ('tuning', 'holdout')
+SAVE_HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; LeadGenBot/1.0)'}
+
+LEGACY_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+LEGACY_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js')
+
+# Long runs without an "@" followed by one real address; an unbounded or
+# unanchored pattern rescans the run from every start position
+PATHOLOGICAL_SIZE = 128 * 1024
+PATHOLOGICAL_RUNS = {
+    'word_run': 'a',
+    'dot_run': 'a.',
+    'whitespace_run': ' ',
+    'spelled_at_run': 'x at ',
+    'spelled_dot_run': 'a dot ',
+    'bracket_run': '( ',
+}
+PATHOLOGICAL_WEBSITE = 'https://runclinic.com'
+PATHOLOGICAL_EXPECTED = 'info@runclinic.com'
+
+def legacy_email(page_text, website=None):
+    """What enrichment used to do: the first regex match that isn't an image"""
+    for match in LEGACY_PATTERN.finditer(page_text):
+        if not match.group().lower().endswith(LEGACY_SUFFIXES):
+            return match.group()
+    return None
+
+def load_labels():
+    with open(LABELS_PATH) as f:
+        return json.load(f)
+
+def load_corpus():
+    """{set name: [(file, text, website, expected)]}"""
+    corpus = {name: [] for name in CORPUS_SETS}
+    for name, label in sorted(load_labels().items()):
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+            corpus[label.get('set', 'tuning')].append((name, f.read(), label['website'], label['expected']))
+    return corpus
+
+def save_page(url, expected):
+    """Download `url` into the holdout set, labelled with `expected` (None for no address)"""
+    import requests
+    from urllib.parse import urlparse
+
+    response = requests.get(url, headers=SAVE_HEADERS, timeout=15)
+    response.raise_for_status()
+    parsed = urlparse(url)
+    slug = re.sub(r'[^a-z0-9]+', '_', (parsed.netloc + parsed.path).lower()).strip('_')
+    name = f'saved_{slug}.html'
+    with open(os.path.join(CORPUS_DIR, name), 'w', encoding='utf-8') as f:
+        f.write(response.text)
+    labels = load_labels()
+    labels[name] = {'website': url, 'expected': expected, 'set': 'holdout'}
+    with open(LABELS_PATH, 'w') as f:
+        json.dump(labels, f, indent=2)
+        f.write('\n')
+    print(f"💾 Saved {url} as {name}")
+
+def pathological_pages():
+    tail = f' Email: {PATHOLOGICAL_EXPECTED}'
+    return [(name, unit * (PATHOLOGICAL_SIZE // len(unit)) + tail, PATHOLOGICAL_WEBSITE, PATHOLOGICAL_EXPECTED)
+            for name, unit in PATHOLOGICAL_RUNS.items()]
+
+def time_pathological(extract, pages):
+    """[(name, milliseconds, correct)] for one pass over each page"""
+    results = []
+    for name, text, website, expected in pages:
+        start = time.perf_counter()
+        found = extract(text, website)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        results.append((name, elapsed_ms, (found or '').lower() == expected))
+    return results
+
+def evaluate(extract, pages, repeat):
+    true_pos = false_pos = false_neg = 0
+    mistakes = []
+    for name, text, website, expected in pages:
+        found = extract(text, website)
+        found = found.lower() if found else None
+        if found and found == expected:
+            true_pos += 1
+        else:
+            if found:
+                false_pos += 1
+            if expected:
+                false_neg += 1
+        if found != expected:
+            mistakes.append(f"{name}: expected {expected}, got {found}")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, text, website, _ in pages:
+            extract(text, website)
+    elapsed = time.perf_counter() - start
+
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 1.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 1.0
+    pages_per_sec = len(pages) * repeat / elapsed if elapsed else float('inf')
+    return precision, recall, pages_per_sec, mistakes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='timing passes over the corpus')
+    parser.add_argument('--verbose', action='store_true', help='list pages each extractor gets wrong')
+    parser.add_argument('--save', metavar='URL', help='save a real contact page into the holdout set')
+    parser.add_argument('--expected', help='with --save: the address a person would pick, or "none"')
+    args = parser.parse_args()
+
+    if args.save:
+        if not args.expected:
+            parser.error('--save needs --expected')
+        save_page(args.save, None if args.expected.lower() == 'none' else args.expected.lower())
+        return
+
+    corpus = load_corpus()
+    for set_name, pages in corpus.items():
+        if not pages:
+            continue
+        print(f"📊 {set_name}: {len(pages)} labelled pages, {args.repeat} timing passes")
+        print(f"{'extractor':<10} {'precision':>9} {'recall':>7} {'pages/s':>10}")
+        for label, extract in (('legacy', legacy_email), ('ranked', best_email)):
+            precision, recall, pages_per_sec, mistakes = evaluate(extract, pages, args.repeat)
+            print(f"{label:<10} {precision:>9.2f} {recall:>7.2f} {pages_per_sec:>10.0f}")
+            if args.verbose:
+                for mistake in mistakes:
+                    print(f"   ❌ {mistake}")
+        print()
+
+    slow_pages = pathological_pages()
+    print(f"🐌 {len(slow_pages)} pathological pages of {PATHOLOGICAL_SIZE // 1024}KB (ms per page)")
+    print(f"{'page':<16} {'ranked':>9}")
+    for name, elapsed_ms, correct in time_pathological(best_email, slow_pages):
+        print(f"{name:<16} {elapsed_ms:>9.1f}{'' if correct else '  ❌ missed address'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""
+Offline benchmark for the outreach pipeline.
+
+Builds synthetic leads databases (1k, 100k and 1M rows by default) and runs
+scraping, enrichment, email generation, sending, the follow-up scheduler and
+the /api endpoints against the local stand-ins in bench/stubs.py. Nothing
+leaves the machine: SerpAPI, Gemini, SMTP and clinic websites are all fake.
+
+    python bench/pipeline.py                          # all sizes, compare to bench/baseline.json
+    python bench/pipeline.py --sizes 1k --llm-latency 0.2
+    python bench/pipeline.py --save-baseline          # store this run as the new baseline
+
+Each size runs in its own process and scratch directory, because the app
+keeps its database and caches under ./data.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+DEFAULT_SIZES = '1k,100k,1m'
+# Leads in each working state, whatever the database size, so per-stage
+# numbers stay comparable across sizes
+SAMPLE_FOUND = 100
+SAMPLE_ENRICHED = 100
+SAMPLE_DUE = 100
+SCRAPE_QUERIES = 4
+API_REPEAT = 100
+# The bulk endpoints cover SAMPLE_ENRICHED leads per request
+BULK_REPEAT = 5
+# p50 slower than baseline by more than this fraction (and by more than
+# REGRESSION_MIN_MS, so sub-millisecond jitter is ignored) counts as a regression
+REGRESSION_THRESHOLD = 0.15
+REGRESSION_MIN_MS = 1.0
+
+# ===== Worker: runs inside a scratch directory =====
+
+def _build_database(rows):
+    """Create data/leads.db with `rows` synthetic leads using the app's schema"""
+    from src.database import LeadStatus, engine
+
+    now = datetime.datetime.utcnow()
+    rng = random.Random(rows)
+    settled = [LeadStatus.CONTACTED.value, LeadStatus.FOLLOWUP_1.value, LeadStatus.CLOSED.value,
+               LeadStatus.MISSING_INFO.value, LeadStatus.REPLIED.value]
+
+    def lead_rows():
+        for n in range(rows):
+            if n < SAMPLE_FOUND:
+                status = LeadStatus.FOUND.value
+            elif n < SAMPLE_FOUND + SAMPLE_ENRICHED:
+                status = LeadStatus.ENRICHED.value
+            elif n < SAMPLE_FOUND + SAMPLE_ENRICHED + SAMPLE_DUE:
+                status = LeadStatus.CONTACTED.value
+            else:
+                status = rng.choice(settled)
+            host = f"clinic{n}.bench.test"
+            has_email = status != LeadStatus.FOUND.value and status != LeadStatus.MISSING_INFO.value
+            created = now - datetime.timedelta(minutes=rng.randrange(90 * 24 * 60))
+            contacted = created + datetime.timedelta(days=1) if status in settled[:3] else None
+            if n < SAMPLE_FOUND + SAMPLE_ENRICHED + SAMPLE_DUE and status == LeadStatus.CONTACTED.value:
+                next_action = now - datetime.timedelta(hours=1)
+            elif status in (LeadStatus.CONTACTED.value, LeadStatus.FOLLOWUP_1.value):
+                next_action = now + datetime.timedelta(days=rng.randrange(1, 30))
+            else:
+                next_action = None
+            yield (f"Dr. Bench {n}", f"Bench Clinic {n}", f"http://{host}/", host,
+                   f"info@{host}" if has_email else None, f"(555) 010-{n % 10000:04d}",
+                   status, contacted, 1 if contacted else 0, created, next_action)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO leads (name, clinic_name, website, domain_key, email, phone, status, "
+            "last_contacted, follow_up_count, created_at, next_action_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            lead_rows()
+        )
+        raw.commit()
+        cursor.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+
+def _summarise(latencies, elapsed, items=None):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def pct(p):
+        if not latencies:
+            return None
+        return latencies[min(count - 1, int(round(p / 100 * (count - 1))))] * 1000
+
+    items = count if items is None else items
+    return {
+        'count': items,
+        'seconds': round(elapsed, 4),
+        'throughput': round(items / elapsed, 2) if elapsed else None,
+        'p50_ms': round(pct(50), 3) if latencies else None,
+        'p99_ms': round(pct(99), 3) if latencies else None,
+    }
+
+def _timed(fn):
+    """Wrap `fn` so every call's duration is appended to `fn.latencies`"""
+    latencies = []
+
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    wrapper.latencies = latencies
+    return wrapper
+
+def _time_requests(call, repeat, url):
+    """Issue `repeat` test-client requests, reading each body in full"""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        request_started = time.perf_counter()
+        response = call()
+        response.get_data()
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+    return _summarise(latencies, time.perf_counter() - started)
+
+def run_worker(rows, llm_latency, site_latency, serp_latency, smtp_latency):
+    from bench.stubs import SiteServer, SMTPSink, FakeLLM, FakeSerpAPI
+
+    sites = SiteServer(latency=site_latency).start()
+    smtp = SMTPSink(cert_dir=os.getcwd(), latency=smtp_latency).start()
+    os.environ['HTTP_PROXY'] = sites.proxy_url
+    os.environ['NO_PROXY'] = 'localhost,127.0.0.1'
+
+    # The app reads SMTP, Gemini and send-rate settings from secrets
+    os.makedirs('.streamlit', exist_ok=True)
+    with open(os.path.join('.streamlit', 'secrets.toml'), 'w') as f:
+        f.write(
+            f'SMTP_SERVER = "127.0.0.1"\nSMTP_PORT = {smtp.port}\nSMTP_USERNAME = "bench"\n'
+            'SMTP_PASSWORD = "bench"\nSMTP_FROM_EMAIL = "bench@example.com"\n'
+            'GEMINI_API_KEY = "bench"\nSERP_API_KEY = "bench"\n'
+            'SEND_RATE_PER_SECOND = 100000\nSEND_BURST = 100000\n'
+            'SMTP_ACCOUNT_RATE_PER_MINUTE = 6000000\nRECIPIENT_DOMAIN_RATE_PER_MINUTE = 6000000\n'
+        )
+
+    results = {}
+    started = time.perf_counter()
+    _build_database(rows)
+    results['build_database'] = _summarise([], time.perf_counter() - started, rows)
+
+    import src.agent as agent
+    import src.mailer as mailer
+    import src.scraper as scraper
+    from src.database import JobStatus, Lead, LeadStatus, get_session
+    from src.events import flush_events
+    from src.scheduler import run_scheduler
+
+    llm = FakeLLM(latency=llm_latency)
+    agent._get_model = lambda: llm
+
+    # Enrichment: home page, then the contact page, for every FOUND lead,
+    # timed per lead from the start of its crawl to its answer
+    crawl_latencies = []
+    finish_crawl = scraper._SiteCrawl._finish
+
+    def timed_finish(crawl):
+        finish_crawl(crawl)
+        crawl_latencies.append(time.perf_counter() - crawl.started)
+
+    scraper._SiteCrawl._finish = timed_finish
+    started = time.perf_counter()
+    scraper.enrich_leads()
+    results['enrich_leads'] = _summarise(crawl_latencies, time.perf_counter() - started)
+
+    # Generation: one Gemini call per ENRICHED lead
+    session = get_session()
+    enriched = session.query(Lead.id, Lead.name, Lead.clinic_name).filter(
+        Lead.status == LeadStatus.ENRICHED.value).all()
+    session.close()
+    generate = _timed(agent.generate_personalized_email)
+    started = time.perf_counter()
+    openings = {lead_id: generate(name, clinic_name) for lead_id, name, clinic_name in enriched}
+    results['generate_personalized_email'] = _summarise(generate.latencies, time.perf_counter() - started)
+
+    # Sending: one email per ENRICHED lead over a shared pool
+    send = _timed(mailer.send_outreach_email)
+    started = time.perf_counter()
+    with mailer.SMTPPool() as pool:
+        for lead_id, opening in openings.items():
+            send(lead_id, "Question for you", f"<p>{opening}</p>", pool)
+    flush_events()
+    results['send_outreach_email'] = _summarise(send.latencies, time.perf_counter() - started)
+
+    # Scheduler: follow-ups for every due lead, sent through send_bulk_emails
+    mailer.send_outreach_email = _timed(mailer.send_outreach_email)
+    started = time.perf_counter()
+    processed = run_scheduler()
+    results['run_scheduler'] = _summarise(mailer.send_outreach_email.latencies,
+                                          time.perf_counter() - started, processed)
+
+    # API reads against the full database
+    import api
+    client = api.app.test_client()
+    middle_id = rows // 2
+    endpoints = {
+        'GET /api/leads': '/api/leads?limit=100',
+        'GET /api/leads?status': '/api/leads?status=Contacted&limit=100',
+        'GET /api/leads?after': f'/api/leads?after={middle_id}&limit=100',
+        'GET /api/leads?q': '/api/leads?q=Clinic%20999&limit=100',
+        'GET /api/analytics': '/api/analytics',
+        'GET /metrics': '/metrics',
+    }
+    for name, url in endpoints.items():
+        results[name] = _time_requests(lambda: client.get(url), API_REPEAT, url)
+
+    # Bulk endpoints: the leads mailed above go back to ENRICHED so the
+    # previews and the send cover the same SAMPLE_ENRICHED leads
+    session = get_session()
+    session.query(Lead).filter(Lead.id.in_(list(openings))).update(
+        {'status': LeadStatus.ENRICHED.value, 'next_action_at': None}, synchronize_session=False)
+    session.commit()
+    session.close()
+    results['POST /api/bulk-preview'] = _time_requests(
+        lambda: client.post('/api/bulk-preview'), BULK_REPEAT, '/api/bulk-preview')
+    results['POST /api/bulk-preview?stream'] = _time_requests(
+        lambda: client.post('/api/bulk-preview?stream=1'), BULK_REPEAT, '/api/bulk-preview?stream=1')
+
+    # bulk-send only queues a job, so time until the job has finished
+    from src.jobs import get_job
+    started = time.perf_counter()
+    response = client.post('/api/bulk-send', json={'lead_ids': list(openings)})
+    if response.status_code != 202:
+        raise RuntimeError(f"/api/bulk-send returned {response.status_code}")
+    job_id = response.get_json()['job_id']
+    while get_job(job_id)['status'] in (JobStatus.QUEUED.value, JobStatus.RUNNING.value):
+        time.sleep(0.01)
+    job = get_job(job_id)
+    if job['status'] != JobStatus.SUCCEEDED.value or job['result']['failed']:
+        raise RuntimeError(f"bulk-send job ended {job['status']}: {job['result'] or job['error']}")
+    elapsed = time.perf_counter() - started
+    results['POST /api/bulk-send'] = _summarise([elapsed], elapsed, job['result']['sent'])
+
+    # Scraping last, so the leads it adds don't change the stages above
+    serp = FakeSerpAPI(latency=serp_latency)
+    scrape = _timed(scraper.process_scraping_job)
+    started = time.perf_counter()
+    new_leads = sum(scrape(f"bench dentists {i}", "bench", max_pages=serp.pages, client=serp, refresh=True)
+                    for i in range(SCRAPE_QUERIES))
+    results['process_scraping_job'] = _summarise(scrape.latencies, time.perf_counter() - started)
+    results['process_scraping_job']['leads'] = new_leads
+
+    results['_stubs'] = {'site_requests': sites.requests, 'smtp_messages': smtp.messages,
+                         'llm_calls': llm.calls, 'serp_requests': serp.requests}
+    return results
+
+# ===== Driver =====
+
+def _run_size(label, rows, args):
+    workdir = tempfile.mkdtemp(prefix=f'leadgen-bench-{label}-')
+    out_path = os.path.join(workdir, 'result.json')
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    command = [sys.executable, os.path.abspath(__file__), '--worker', '--rows', str(rows), '--out', out_path,
+               '--llm-latency', str(args.llm_latency), '--site-latency', str(args.site_latency),
+               '--serp-latency', str(args.serp_latency), '--smtp-latency', str(args.smtp_latency)]
+    try:
+        completed = subprocess.run(command, cwd=workdir, env=env,
+                                   stdout=None if args.verbose else subprocess.DEVNULL)
+        if completed.returncode != 0:
+            raise SystemExit(f"❌ Benchmark worker for {label} failed (exit {completed.returncode})")
+        with open(out_path) as f:
+            return json.load(f)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def _print_report(label, results, baseline):
+    print(f"\n📊 {label} leads")
+    print(f"{'stage':<30} {'count':>7} {'per sec':>10} {'p50 ms':>10} {'p99 ms':>10} {'vs baseline':>12}")
+    regressions = []
+    for stage, metrics in results.items():
+        if stage.startswith('_'):
+            continue
+        previous = (baseline or {}).get(label, {}).get(stage)
+        change = ''
+        if previous and previous.get('p50_ms') and metrics.get('p50_ms') is not None:
+            delta = metrics['p50_ms'] / previous['p50_ms'] - 1
+            change = f"{delta:+.0%}"
+            if delta > REGRESSION_THRESHOLD and metrics['p50_ms'] - previous['p50_ms'] > REGRESSION_MIN_MS:
+                change += ' ⚠️'
+                regressions.append(f"{label} {stage}")
+        elif previous and previous.get('throughput') and metrics.get('throughput'):
+            delta = metrics['throughput'] / previous['throughput'] - 1
+            change = f"{delta:+.0%} tput"
+            if delta < -REGRESSION_THRESHOLD:
+                change += ' ⚠️'
+                regressions.append(f"{label} {stage}")
+
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else format('-', '>10')
+        print(f"{stage:<30} {metrics['count']:>7} {fmt(metrics['throughput'], '>10.1f')} "
+              f"{fmt(metrics['p50_ms'], '>10.2f')} {fmt(metrics['p99_ms'], '>10.2f')} {change:>12}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark for the outreach pipeline')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='fake Gemini seconds per call')
+    parser.add_argument('--site-latency', type=float, default=0.0, help='stub website seconds per page')
+    parser.add_argument('--serp-latency', type=float, default=0.2, help='fake SerpAPI seconds per request')
+    parser.add_argument('--smtp-latency', type=float, default=0.0, help='SMTP sink seconds per message')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directories')
+    parser.add_argument('--verbose', action='store_true', help="show the app's own log output")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.rows, args.llm_latency, args.site_latency, args.serp_latency, args.smtp_latency)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    run = {}
+    regressions = []
+    for label in [s.strip().lower() for s in args.sizes.split(',') if s.strip()]:
+        if label not in SIZES:
+            raise SystemExit(f"Unknown size '{label}', pick from {', '.join(SIZES)}")
+        print(f"⏳ Running {label} ({SIZES[label]:,} leads)...")
+        run[label] = _run_size(label, SIZES[label], args)
+        regressions += _print_report(label, run[label], baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+    elif baseline is None:
+        print(f"\nℹ️ No baseline at {args.baseline}; run with --save-baseline to store one")
+    elif regressions:
+        print(f"\n⚠️ Slower than baseline: {', '.join(regressions)}")
+        raise SystemExit(1)
+    else:
+        print("\n✅ No regressions against baseline")
+
+if __name__ == '__main__':
+    main()
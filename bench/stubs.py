@@ -0,0 +1,220 @@
+"""
+Local stand-ins for the services the pipeline talks to, for offline benchmarks.
+
+- SiteServer: HTTP proxy that serves a small clinic website for any
+  http://<name>.bench.test/ host (point HTTP_PROXY at it)
+- SMTPSink: SMTP server with STARTTLS and AUTH that accepts and counts mail
+- FakeLLM: stands in for the Gemini model with a fixed response latency
+- FakeSerpAPI: SerpAPI client callable returning paginated Maps results
+"""
+import http.server
+import json
+import os
+import re
+import socketserver
+import ssl
+import subprocess
+import threading
+import time
+from urllib.parse import urlparse
+
+BENCH_DOMAIN = 'bench.test'
+
+HOME_PAGE = """<html><head><title>{name}</title></head><body>
+<nav><a href="/services">Services</a> <a href="/contact">Contact us</a></nav>
+<h1>{name}</h1><p>{filler}</p>
+<footer><img src="/img/logo@2x.png"> Call (555) 010-{n:04d}</footer>
+</body></html>"""
+CONTACT_PAGE = """<html><body><h1>Contact</h1><p>{filler}</p>
+<p>Email: <a href="mailto:info@{host}">info@{host}</a></p></body></html>"""
+FILLER = "Gentle family dentistry, implants and same-day appointments. " * 40
+
+class _ThreadingHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+class SiteServer:
+    """
+    Serves every *.bench.test site through one local port, acting as the
+    HTTP proxy `requests` sends absolute URLs to. Home pages have no address
+    so enrichment has to follow the contact link, like most real sites.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                host = (parsed.netloc or self.headers.get('Host', '')).split(':')[0]
+                number = re.search(r'(\d+)', host)
+                n = int(number.group(1)) if number else 0
+                if parsed.path in ('', '/'):
+                    body = HOME_PAGE.format(name=host.split('.')[0].title(), filler=FILLER, n=n % 10000)
+                elif parsed.path == '/contact':
+                    body = CONTACT_PAGE.format(filler=FILLER, host=host)
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self._httpd.server_address[1]
+
+    @property
+    def proxy_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+
+def _self_signed_cert(directory):
+    cert = os.path.join(directory, 'smtp_sink.pem')
+    key = os.path.join(directory, 'smtp_sink.key')
+    if not os.path.exists(cert):
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+             '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+            check=True, capture_output=True
+        )
+    return cert, key
+
+class SMTPSink:
+    """
+    Minimal SMTP server: EHLO, STARTTLS (self-signed), AUTH, MAIL, RCPT,
+    DATA, RSET, NOOP, QUIT. Messages are counted and discarded.
+    """
+
+    def __init__(self, cert_dir, latency=0.0):
+        self.latency = latency
+        self.messages = 0
+        self._lock = threading.Lock()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*_self_signed_cert(cert_dir))
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write((line + '\r\n').encode())
+                self.wfile.flush()
+
+            def handle(self):
+                self.reply('220 localhost bench sink')
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    command = raw.decode(errors='ignore').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.wfile.write(b'250-localhost\r\n250-STARTTLS\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+                        self.wfile.flush()
+                    elif verb == 'STARTTLS':
+                        self.reply('220 ready for TLS')
+                        self.connection = context.wrap_socket(self.connection, server_side=True)
+                        self.rfile = self.connection.makefile('rb')
+                        self.wfile = self.connection.makefile('wb')
+                    elif verb == 'AUTH':
+                        self.reply('235 authenticated')
+                    elif verb == 'DATA':
+                        self.reply('354 end with .')
+                        while self.rfile.readline() not in (b'.\r\n', b''):
+                            pass
+                        if sink.latency:
+                            time.sleep(sink.latency)
+                        with sink._lock:
+                            sink.messages += 1
+                        self.reply('250 queued')
+                    elif verb == 'QUIT':
+                        self.reply('221 bye')
+                        return
+                    else:
+                        self.reply('250 ok')
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeLLM:
+    """Drop-in for the Gemini model: generate_content() sleeps `latency` seconds"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        # Batch prompts carry a JSON list of clinics and expect one back
+        match = re.search(r'\[\s*\{.*\}\s*\]', prompt, re.DOTALL)
+        if match:
+            clinics = json.loads(match.group(0))
+            return _FakeResponse(json.dumps([
+                {'id': c['id'], 'opening': f"Hi {c['contact_name']}, {c['clinic_name']} caught my eye."}
+                for c in clinics
+            ]))
+        return _FakeResponse("Hi there, your clinic's patient reviews caught my eye.")
+
+class FakeSerpAPI:
+    """
+    SerpAPI client stand-in: `results_per_page` Maps results per page and
+    `pages` pages per query, after `latency` seconds per request.
+    """
+
+    def __init__(self, latency=0.2, pages=3, results_per_page=20):
+        self.latency = latency
+        self.pages = pages
+        self.results_per_page = results_per_page
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, params):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        start = int(params.get('start', 0))
+        slug = re.sub(r'[^a-z0-9]+', '-', params['q'].lower()).strip('-')
+        results = [{
+            'title': f"{params['q']} clinic {start + i}",
+            'place_id': f"{slug}-{start + i}",
+            'website': f"http://{slug}-{start + i}.{BENCH_DOMAIN}/",
+            'phone': f"(555) 020-{(start + i) % 10000:04d}",
+        } for i in range(self.results_per_page)]
+        response = {'local_results': results}
+        if start // self.results_per_page + 1 < self.pages:
+            response['serpapi_pagination'] = {'next': f"start={start + self.results_per_page}"}
+        return response
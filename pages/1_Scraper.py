@@ -1,7 +1,8 @@
 import streamlit as st
 from src.ui_styles import apply_ios_style
-from src.scraper import process_scraping_job, enrich_leads
-from src.database import get_session, Lead
+from src.scraper import process_scraping_job, enrich_leads, serp_cache, SERP_MAX_PAGES, SERP_PAGE_LIMIT
+from src.database import get_session, Lead, mark_leads_changed
+from src.ui_data import lead_count
 
 st.set_page_config(page_title="Clinic Scraper", page_icon="🔍")
 apply_ios_style()
@@ -9,14 +10,23 @@ st.title("🔍 Clinic Scraper")
 
 with st.form("scraper_form"):
     query = st.text_input("Search Query (e.g. 'Dental clinics in New York')", value="Dental clinics in New York")
+    locations = st.text_area("Locations (optional, one per line — each is searched as '<query> in <location>')")
+    max_pages = st.number_input("Result pages per search", min_value=1, max_value=SERP_PAGE_LIMIT, value=SERP_MAX_PAGES,
+                                help="Each extra page is one more SerpAPI request per search")
+    refresh = st.checkbox("Bypass search cache", help="Ask SerpAPI again even if these searches ran recently")
     submit = st.form_submit_button("Start Scraping")
 
 if submit:
     try:
         serp_api_key = st.secrets["SERP_API_KEY"]
+        location_list = [line.strip() for line in locations.splitlines() if line.strip()]
         with st.spinner("Scraping leads from Google Maps..."):
-            count = process_scraping_job(query, serp_api_key)
+            count = process_scraping_job(query, serp_api_key, locations=location_list, max_pages=int(max_pages),
+                                         refresh=refresh)
             st.success(f"Found {count} new leads!")
+            cache_stats = serp_cache.stats()
+            st.caption(f"Search cache hit rate this session: {cache_stats['hit_rate']:.0%} "
+                       f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
             
         with st.spinner("Enriching leads with emails..."):
             enriched = enrich_leads()
@@ -28,12 +38,15 @@ if submit:
 st.divider()
 
 st.subheader("Scraping History")
-session = get_session()
-leads = session.query(Lead).all()
-if leads:
-    st.write(f"Total leads in database: {len(leads)}")
+total_leads = lead_count()
+if total_leads:
+    st.write(f"Total leads in database: {total_leads}")
     if st.button("Clear Database"):
-        session.query(Lead).delete()
-        session.commit()
+        session = get_session()
+        try:
+            session.query(Lead).delete()
+            session.commit()
+        finally:
+            session.close()
+        mark_leads_changed()
         st.rerun()
-session.close()
@@ -1,10 +1,11 @@
 import streamlit as st
 from src.ui_styles import apply_ios_style
 import pandas as pd
-from src.database import Lead, LeadStatus, get_session
+from src.database import LeadStatus
 from src.scheduler import run_scheduler
-from src.agent import generate_personalized_email, get_email_body
-from src.mailer import send_outreach_email
+from src.agent import generate_personalized_email, generate_personalized_emails, get_email_body, opening_cache
+from src.mailer import send_outreach_email, send_bulk_emails
+from src.ui_data import lead_count, lead_page, LEAD_PAGE_SIZES, FOLLOWUP_STATUSES
 
 st.set_page_config(page_title="Campaign Management", page_icon="🎯", layout="wide")
 apply_ios_style()
@@ -15,11 +16,29 @@ st.title("🎯 Campaign Management")
 if 'email_previews' not in st.session_state:
     st.session_state.email_previews = {}
 
-session = get_session()
-leads = session.query(Lead).all()
+def paged_leads(key, statuses=None, search='', include_duplicates=True):
+    """Page controls plus the matching page of lead records; only that page is loaded"""
+    col_size, col_page, col_info = st.columns([1, 1, 3])
+    page_size = col_size.selectbox("Rows per page", LEAD_PAGE_SIZES, key=f"{key}_size")
+    page = col_page.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    records, total = lead_page(statuses, search, page - 1, page_size, include_duplicates)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # Filters shrank the result set below the selected page
+        page = pages
+        records, total = lead_page(statuses, search, page - 1, page_size, include_duplicates)
+    col_info.caption(f"Page {page} of {pages} · {total} leads")
+    return records, total
 
-if leads:
-    df = pd.DataFrame([{
+if lead_count():
+    st.subheader("Manage Leads")
+    
+    # Filters
+    col_status, col_search = st.columns([2, 1])
+    status_filter = col_status.multiselect("Filter by Status", options=[status.value for status in LeadStatus], default=[])
+    search = col_search.text_input("Search clinic or email")
+    page_leads, _ = paged_leads("grid", status_filter, search)
+    filtered_df = pd.DataFrame([{
         "ID": l.id,
         "Clinic": l.clinic_name,
         "Website": l.website,
@@ -27,16 +46,7 @@ if leads:
         "Status": l.status,
         "Followups": l.follow_up_count,
         "Last Contacted": l.last_contacted
-    } for l in leads])
-    
-    st.subheader("Manage Leads")
-    
-    # Filters
-    status_filter = st.multiselect("Filter by Status", options=[status.value for status in LeadStatus], default=[])
-    if status_filter:
-        filtered_df = df[df['Status'].isin(status_filter)]
-    else:
-        filtered_df = df
+    } for l in page_leads])
         
     st.dataframe(filtered_df, use_container_width=True)
     
@@ -48,8 +58,8 @@ if leads:
         st.subheader("Preview & Send Individual Emails")
         st.write("Generate personalized emails for each lead, review and edit before sending.")
         
-        # Get enriched leads
-        enriched_leads = [l for l in leads if l.status == LeadStatus.ENRICHED.value]
+        # Get enriched leads, one page at a time
+        enriched_leads, _ = paged_leads("individual", [LeadStatus.ENRICHED.value], include_duplicates=False)
         
         if enriched_leads:
             for lead in enriched_leads:
@@ -64,7 +74,7 @@ if leads:
                         # Preview Email Button
                         if st.button(f"🔍 Preview Email", key=f"preview_{lead.id}"):
                             with st.spinner("Generating personalized email..."):
-                                opening = generate_personalized_email(lead.name, lead.clinic_name)
+                                opening = generate_personalized_email(lead.name, lead.clinic_name, lead_id=lead.id)
                                 subject = f"Question for {lead.clinic_name}"
                                 body = get_email_body(lead, opening)
                                 
@@ -123,25 +133,27 @@ if leads:
     # ========== TAB 2: BULK SEND ==========
     with tab2:
         st.subheader("Bulk Email Campaign")
-        st.write("Generate and send emails to all enriched leads at once.")
+        st.write("Generate and send emails to a page of enriched leads at once.")
         
-        enriched_leads = [l for l in leads if l.status == LeadStatus.ENRICHED.value]
+        enriched_leads, enriched_total = paged_leads("bulk", [LeadStatus.ENRICHED.value], include_duplicates=False)
         
         if enriched_leads:
-            st.write(f"**{len(enriched_leads)} leads** ready for outreach")
+            st.write(f"**{enriched_total} leads** ready for outreach")
             
-            # Preview all emails button
-            if st.button("🔍 Preview All Emails", key="preview_all"):
-                with st.spinner("Generating personalized emails for all leads..."):
+            # Preview emails for the leads on this page
+            if st.button(f"🔍 Preview {len(enriched_leads)} Emails", key="preview_all"):
+                with st.spinner("Generating personalized emails for this page..."):
+                    openings = generate_personalized_emails(enriched_leads)
                     bulk_previews = {}
                     for lead in enriched_leads:
-                        opening = generate_personalized_email(lead.name, lead.clinic_name)
+                        opening = openings[lead.id]
                         subject = f"Question for {lead.clinic_name}"
                         body = get_email_body(lead, opening)
                         bulk_previews[lead.id] = {
+                            'clinic_name': lead.clinic_name,
+                            'email': lead.email,
                             'subject': subject,
-                            'body': body,
-                            'lead': lead
+                            'body': body
                         }
                     st.session_state.bulk_previews = bulk_previews
                     st.rerun()
@@ -150,20 +162,22 @@ if leads:
             if 'bulk_previews' in st.session_state and st.session_state.bulk_previews:
                 st.divider()
                 st.write("**📧 Email Previews**")
+                cache_stats = opening_cache.stats()
+                st.caption(f"Opening cache hit rate this session: {cache_stats['hit_rate']:.0%} "
+                           f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
                 
                 # Checkboxes to select/deselect leads
                 selected_leads = []
                 for lead_id, preview_data in st.session_state.bulk_previews.items():
-                    lead = preview_data['lead']
                     include = st.checkbox(
-                        f"✅ {lead.clinic_name} ({lead.email})",
+                        f"✅ {preview_data['clinic_name']} ({preview_data['email']})",
                         value=True,
                         key=f"bulk_select_{lead_id}"
                     )
                     
                     if include:
                         selected_leads.append(lead_id)
-                        with st.expander(f"Preview: {lead.clinic_name}"):
+                        with st.expander(f"Preview: {preview_data['clinic_name']}"):
                             st.write(f"**Subject:** {preview_data['subject']}")
                             st.write(f"**Body:**")
                             st.text(preview_data['body'])
@@ -177,26 +191,21 @@ if leads:
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        sent_count = 0
-                        failed_count = 0
+                        done = []
                         
-                        for idx, lead_id in enumerate(selected_leads):
-                            preview_data = st.session_state.bulk_previews[lead_id]
-                            lead = preview_data['lead']
-                            
-                            status_text.text(f"Sending to {lead.clinic_name}...")
-                            success = send_outreach_email(
-                                lead_id,
-                                preview_data['subject'],
-                                preview_data['body']
-                            )
-                            
-                            if success:
-                                sent_count += 1
-                            else:
-                                failed_count += 1
-                            
-                            progress_bar.progress((idx + 1) / len(selected_leads))
+                        def on_result(lead_id, success):
+                            done.append(lead_id)
+                            clinic_name = st.session_state.bulk_previews[lead_id]['clinic_name']
+                            status_text.text(f"Sent to {clinic_name}" if success else f"Failed: {clinic_name}")
+                            progress_bar.progress(len(done) / len(selected_leads))
+                        
+                        sent_count, failed_count = send_bulk_emails(
+                            [(lead_id,
+                              st.session_state.bulk_previews[lead_id]['subject'],
+                              st.session_state.bulk_previews[lead_id]['body'])
+                             for lead_id in selected_leads],
+                            on_result=on_result
+                        )
                         
                         status_text.empty()
                         progress_bar.empty()
@@ -225,26 +234,19 @@ if leads:
                 st.rerun()
         
         # Show leads in follow-up stages
-        followup_leads = [l for l in leads if l.status in [
-            LeadStatus.CONTACTED.value,
-            LeadStatus.FOLLOWUP_1.value,
-            LeadStatus.FOLLOWUP_2.value,
-            LeadStatus.FOLLOWUP_3.value
-        ]]
+        in_followup, followup_total = paged_leads("followup", FOLLOWUP_STATUSES)
         
-        if followup_leads:
-            st.write(f"**{len(followup_leads)} leads** in follow-up stages")
+        if in_followup:
+            st.write(f"**{followup_total} leads** in follow-up stages")
             followup_df = pd.DataFrame([{
                 "Clinic": l.clinic_name,
                 "Email": l.email,
                 "Status": l.status,
                 "Followups": l.follow_up_count,
                 "Last Contacted": l.last_contacted
-            } for l in followup_leads])
+            } for l in in_followup])
             st.dataframe(followup_df, use_container_width=True)
         else:
             st.info("No leads currently in follow-up stages.")
 else:
     st.info("No leads available. Go to the Scraper page first.")
-
-session.close()
@@ -1,39 +1,246 @@
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import google.generativeai as genai
 import streamlit as st
-from src.database import Lead, LeadStatus, get_session
+from src.database import Lead, LeadStatus, EventType, get_session
+from src.events import record_event, record_events
+from src.cache import PersistentCache, make_key
+from src.metrics import CACHE_LOOKUPS, STAGE_EVENTS, STAGE_SECONDS
 
-def generate_personalized_email(lead_name, clinic_name, website_description=None):
-    """Generate personalized email opening using Gemini AI with fallback"""
-    try:
-        api_key = st.secrets["GEMINI_API_KEY"]
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""
+MODEL_NAME = 'gemini-1.5-flash'
+
+PROMPT_TEMPLATE = """
         You are a professional outreach assistant. 
         Write a short, non-spammy, and helpful opening line for a cold email to a clinic.
         
         Clinic Name: {clinic_name}
-        Contact Name: {lead_name if lead_name else "there"}
-        Website Context: {website_description if website_description else "Professional clinic"}
+        Contact Name: {lead_name}
+        Website Context: {website_description}
         
         The goal is to sound human and genuinely interested in their clinic. 
         Return ONLY the opening line.
         """
+
+BATCH_PROMPT_TEMPLATE = """
+        You are a professional outreach assistant. 
+        Write a short, non-spammy, and helpful opening line for a cold email to each clinic below.
+        The goal is to sound human and genuinely interested in each clinic.
+        
+        Clinics (JSON):
+        {clinics}
+        
+        Return ONLY a JSON array with exactly one object per clinic, in the form
+        {{"id": <clinic id>, "opening": "<opening line>"}}.
+        """
+
+# Leads packed into one Gemini request by generate_personalized_emails
+BATCH_SIZE = 20
+# Small batches for streaming so the first previews arrive quickly
+STREAM_BATCH_SIZE = 5
+STREAM_CONCURRENCY = 4
+MAX_OPENING_LENGTH = 400
+
+# Changing the model or either prompt invalidates previously cached openings;
+# single and batch openings share one cache, so both templates are hashed
+PROMPT_VERSION = make_key(MODEL_NAME, PROMPT_TEMPLATE, BATCH_PROMPT_TEMPLATE)[:12]
+
+# Generated openings are reused for a week
+opening_cache = PersistentCache('openings', ttl=7 * 24 * 3600, max_entries=50000)
+CACHE_LOOKUPS.set_function(lambda: opening_cache.hits, cache="openings", result="hit")
+CACHE_LOOKUPS.set_function(lambda: opening_cache.misses, cache="openings", result="miss")
+
+def _opening_key(lead_name, clinic_name, website_description):
+    return make_key(PROMPT_VERSION, lead_name, clinic_name, website_description)
+
+def _get_model():
+    api_key = st.secrets["GEMINI_API_KEY"]
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODEL_NAME)
+
+def _fallback_opening(lead_name, clinic_name):
+    return f"Hi {lead_name if lead_name else 'there'}, I came across {clinic_name} and was impressed by your work."
+
+def generate_personalized_email(lead_name, clinic_name, website_description=None, lead_id=None):
+    """
+    Generate personalized email opening using Gemini AI with fallback.
+
+    A DRAFTED event is recorded for `lead_id` when an opening is actually
+    generated (Gemini or fallback), not when it comes from the cache.
+    """
+    cache_key = _opening_key(lead_name, clinic_name, website_description)
+    cached = opening_cache.get(cache_key)
+    if cached:
+        STAGE_EVENTS.inc(stage="generate", outcome="cached")
+        return cached
+
+    started = time.perf_counter()
+    try:
+        model = _get_model()
+        
+        prompt = PROMPT_TEMPLATE.format(
+            clinic_name=clinic_name,
+            lead_name=lead_name if lead_name else "there",
+            website_description=website_description if website_description else "Professional clinic"
+        )
         
         response = model.generate_content(prompt)
         generated_text = response.text.strip()
         print(f"✅ Gemini AI generated: {generated_text[:50]}...")
+        opening_cache.set(cache_key, generated_text)
+        STAGE_EVENTS.inc(stage="generate", outcome="success")
+        if lead_id is not None:
+            record_event(EventType.DRAFTED, lead_id)
         return generated_text
         
     except Exception as e:
         error_msg = str(e)
         print(f"⚠️ Gemini API Error: {error_msg}")
         
-        # Fallback to template-based personalization
-        fallback = f"Hi {lead_name if lead_name else 'there'}, I came across {clinic_name} and was impressed by your work."
+        # Fallback to template-based personalization (not cached, so the next call retries Gemini)
+        fallback = _fallback_opening(lead_name, clinic_name)
         print(f"📝 Using fallback: {fallback}")
+        STAGE_EVENTS.inc(stage="generate", outcome="fallback")
+        if lead_id is not None:
+            record_event(EventType.DRAFTED, lead_id)
         return fallback
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="generate")
+
+def _parse_batch_response(text):
+    """Extract {id: opening} from a batch response, ignoring malformed items"""
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return {}
+
+    openings = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        opening = item.get("opening")
+        if isinstance(opening, str) and 0 < len(opening.strip()) <= MAX_OPENING_LENGTH:
+            openings[str(item.get("id"))] = opening.strip()
+    return openings
+
+def _generate_batch(batch):
+    """Ask Gemini for openings for several leads in one request"""
+    clinics = [{
+        "id": lead.id,
+        "clinic_name": lead.clinic_name,
+        "contact_name": lead.name if lead.name else "there",
+        "website_context": description if description else "Professional clinic"
+    } for lead, description, _ in batch]
+
+    model = _get_model()
+    prompt = BATCH_PROMPT_TEMPLATE.format(clinics=json.dumps(clinics, indent=2))
+    with STAGE_SECONDS.time(stage="generate_batch"):
+        response = model.generate_content(prompt)
+    return _parse_batch_response(response.text)
+
+def generate_personalized_emails(leads, website_descriptions=None, batch_size=BATCH_SIZE):
+    """
+    Generate openings for many leads, packing `batch_size` leads per Gemini call.
+
+    Returns {lead.id: opening}. Cached openings are reused; any lead missing
+    or malformed in a batch response is retried on its own through
+    generate_personalized_email. If the batch request itself fails, its
+    leads get the template opening instead of N more failing calls.
+    """
+    website_descriptions = website_descriptions or {}
+    openings = {}
+    pending = []
+    drafted = []
+
+    for lead in leads:
+        description = website_descriptions.get(lead.id)
+        cache_key = _opening_key(lead.name, lead.clinic_name, description)
+        cached = opening_cache.get(cache_key)
+        if cached:
+            openings[lead.id] = cached
+        else:
+            pending.append((lead, description, cache_key))
+    if openings:
+        STAGE_EVENTS.inc(len(openings), stage="generate", outcome="cached")
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            generated = _generate_batch(batch)
+            batch_failed = False
+            matched = sum(1 for lead, _, _ in batch if str(lead.id) in generated)
+            print(f"✅ Gemini AI generated {matched}/{len(batch)} openings in one batch")
+            STAGE_EVENTS.inc(stage="generate_batch", outcome="success")
+        except Exception as e:
+            print(f"⚠️ Gemini API Error (batch of {len(batch)}): {e}")
+            STAGE_EVENTS.inc(stage="generate_batch", outcome="failure")
+            generated = {}
+            batch_failed = True
+
+        for lead, description, cache_key in batch:
+            opening = generated.get(str(lead.id))
+            if opening:
+                opening_cache.set(cache_key, opening)
+                openings[lead.id] = opening
+                drafted.append(lead.id)
+                STAGE_EVENTS.inc(stage="generate", outcome="success")
+            elif batch_failed:
+                openings[lead.id] = _fallback_opening(lead.name, lead.clinic_name)
+                drafted.append(lead.id)
+                STAGE_EVENTS.inc(stage="generate", outcome="fallback")
+            else:
+                # Records its own DRAFTED event
+                openings[lead.id] = generate_personalized_email(lead.name, lead.clinic_name, description,
+                                                                lead_id=lead.id)
+
+    # Cache hits were drafted by an earlier call and are not counted again
+    if drafted:
+        record_events(EventType.DRAFTED, drafted)
+    return openings
+
+def iter_personalized_emails(leads, batch_size=STREAM_BATCH_SIZE, max_concurrency=STREAM_CONCURRENCY):
+    """
+    Yield (lead, opening, error) triples as soon as each one is generated.
+
+    Cached openings are yielded first, before any Gemini call. The remaining
+    leads are split into small batches that run concurrently, at most
+    `max_concurrency` at a time. If a batch raises, each of its leads is
+    yielded with opening None and the exception as `error`, and the other
+    batches carry on. Closing the generator (e.g. when the HTTP client
+    disconnects) cancels the batches that have not started yet.
+    """
+    misses = []
+    for lead in leads:
+        cached = opening_cache.get(_opening_key(lead.name, lead.clinic_name, None))
+        if cached:
+            STAGE_EVENTS.inc(stage="generate", outcome="cached")
+            yield lead, cached, None
+        else:
+            misses.append(lead)
+
+    batches = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+    if not batches:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    try:
+        futures = {executor.submit(generate_personalized_emails, batch, None, batch_size): batch
+                   for batch in batches}
+        for future in as_completed(futures):
+            try:
+                openings = future.result()
+            except Exception as e:
+                for lead in futures[future]:
+                    yield lead, None, e
+                continue
+            for lead in futures[future]:
+                yield lead, openings[lead.id], None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 def get_email_body(lead, custom_opening):
     """Generate complete email body"""
@@ -0,0 +1,93 @@
+import threading
+import time
+from sqlalchemy import func
+from src.database import Lead, LeadStatus, EventType, get_session, leads_version, events_version
+from src.events import get_event_series
+
+# Seconds an aggregate may be served from memory when nothing was written
+ANALYTICS_TTL = 30
+
+CONTACTED_STATUSES = [
+    LeadStatus.CONTACTED.value,
+    LeadStatus.FOLLOWUP_1.value,
+    LeadStatus.FOLLOWUP_2.value,
+    LeadStatus.FOLLOWUP_3.value,
+    LeadStatus.REPLIED.value,
+    LeadStatus.CLOSED.value,
+]
+ENRICHED_STATUSES = [LeadStatus.ENRICHED.value] + CONTACTED_STATUSES
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _cached(name, compute, *args, version_of=leads_version):
+    """Serve `compute(*args)` from memory until the TTL passes or `version_of()` changes"""
+    key = (name, args)
+    version = version_of()
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry and entry[0] == version and now - entry[1] < ANALYTICS_TTL:
+        return entry[2]
+
+    value = compute(*args)
+    with _cache_lock:
+        _cache[key] = (version, now, value)
+    return value
+
+def _status_counts():
+    session = get_session()
+    try:
+        rows = session.query(Lead.status, func.count(Lead.id)).group_by(Lead.status).all()
+        return {status: count for status, count in rows}
+    finally:
+        session.close()
+
+def _daily_sends(days):
+    buckets, sent = get_event_series(EventType.SENT, 'day', days)
+    _, failed = get_event_series(EventType.FAILED, 'day', days)
+    return {
+        'dates': [bucket.date().isoformat() for bucket in buckets],
+        'sent': sent,
+        'failed': failed,
+        'opened': [0] * days,  # open tracking is not implemented
+    }
+
+def get_status_counts():
+    """{status: count} computed with GROUP BY"""
+    return _cached('status_counts', _status_counts)
+
+def get_daily_sends(days=7):
+    """Emails sent / failed per UTC day for the last `days` days, from the event rollups"""
+    return _cached('daily_sends', _daily_sends, days, version_of=events_version)
+
+def get_hourly_events(event_type, hours=24):
+    """Event counts per UTC hour for the last `hours` hours"""
+    def compute(event_type, hours):
+        buckets, counts = get_event_series(event_type, 'hour', hours)
+        return {'hours': [bucket.isoformat() for bucket in buckets], 'counts': counts}
+    return _cached('hourly_events', compute, EventType(event_type).value, hours, version_of=events_version)
+
+def get_funnel():
+    """Funnel totals and conversion rates derived from the status counts"""
+    counts = get_status_counts()
+    total = sum(counts.values())
+    enriched = sum(counts.get(s, 0) for s in ENRICHED_STATUSES)
+    contacted = sum(counts.get(s, 0) for s in CONTACTED_STATUSES)
+    replied = counts.get(LeadStatus.REPLIED.value, 0)
+    return {
+        'total': total,
+        'enriched': enriched,
+        'contacted': contacted,
+        'replied': replied,
+        'enrichment_rate': enriched / total if total else 0.0,
+        'reach_rate': contacted / total if total else 0.0,
+        'reply_rate': replied / contacted if contacted else 0.0,
+    }
+
+def get_analytics_summary(days=7):
+    return {
+        'status_counts': get_status_counts(),
+        'daily_stats': get_daily_sends(days),
+        'funnel': get_funnel(),
+    }
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DB_PATH = os.path.join('data', 'cache.db')
+# Hits record access times in memory; they are written back in one batch
+# after this many hits or seconds, or with the next set / eviction
+TOUCH_FLUSH_SIZE = 256
+TOUCH_FLUSH_SECONDS = 30
+
+def make_key(*parts):
+    """Stable hash of JSON-serialisable key parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class PersistentCache:
+    """
+    Two-level key/value cache: an in-process LRU in front of a SQLite table.
+
+    Entries older than `ttl` seconds are treated as missing. When the table
+    grows past `max_entries` the least recently used rows are evicted;
+    hits from either level count as use, and their access times reach the
+    table in batches rather than one write per hit. Values must be
+    JSON-serialisable. Hit/miss counts are kept per process.
+    """
+
+    def __init__(self, name, ttl, max_entries=10000, memory_entries=512, path=CACHE_DB_PATH):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._touched = {}
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{name}" (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_accessed_at" ON "{name}" (accessed_at)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _touch(self, key, now):
+        with self._lock:
+            self._touched[key] = now
+            due = (len(self._touched) >= TOUCH_FLUSH_SIZE
+                   or time.monotonic() - self._last_flush >= TOUCH_FLUSH_SECONDS)
+        if due:
+            self.flush_touches()
+
+    def _write_touches(self, conn):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if touched:
+            conn.executemany(f'UPDATE "{self.name}" SET accessed_at = ? WHERE key = ?',
+                             [(at, key) for key, at in touched.items()])
+
+    def flush_touches(self):
+        """Write batched access times so LRU eviction sees recent hits"""
+        conn = self._conn()
+        self._write_touches(conn)
+        conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            fresh = entry is not None and now - entry[1] < self.ttl
+            if fresh:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if fresh:
+            self._touch(key, now)
+            return entry[0]
+
+        conn = self._conn()
+        row = conn.execute(
+            f'SELECT value, created_at FROM "{self.name}" WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or now - row[1] >= self.ttl:
+            with self._lock:
+                self._memory.pop(key, None)
+                self.misses += 1
+            return None
+
+        self._touch(key, now)
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            f'INSERT OR REPLACE INTO "{self.name}" (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now, now)
+        )
+        self._write_touches(conn)
+        conn.commit()
+        self._remember(key, value, now)
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired rows and trim the table to `max_entries`"""
+        conn = self._conn()
+        self._write_touches(conn)
+        conn.execute(f'DELETE FROM "{self.name}" WHERE created_at < ?', (time.time() - self.ttl,))
+        conn.execute(f"""
+            DELETE FROM "{self.name}" WHERE key IN (
+                SELECT key FROM "{self.name}" ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute(f'DELETE FROM "{self.name}"')
+        conn.commit()
+        with self._lock:
+            self._memory.clear()
+            self._touched = {}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+        }
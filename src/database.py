@@ -1,9 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Text, DateTime, Index, PrimaryKeyConstraint, bindparam, select, or_, and_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
 import os
+from urllib.parse import urlparse, parse_qsl, urlencode
 from enum import Enum
+from src.email_extractor import VENDOR_DOMAINS
 
 Base = declarative_base()
 
@@ -25,20 +28,539 @@ class Lead(Base):
     name = Column(String)
     clinic_name = Column(String)
     website = Column(String, unique=True)
+    # canonical_domain(website): one lead per business; NULL on duplicates
+    domain_key = Column(String, nullable=True)
+    # Lead this row was found to duplicate when domain keys were backfilled;
+    # kept with its own history but left out of enrichment and outreach
+    duplicate_of = Column(Integer, nullable=True)
     email = Column(String)
     phone = Column(String)
     status = Column(String, default=LeadStatus.FOUND)
     last_contacted = Column(DateTime, nullable=True)
     follow_up_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # When the scheduler should next act on this lead (follow up or close);
+    # NULL for leads outside the follow-up sequence
+    next_action_at = Column(DateTime, nullable=True)
+    # Scheduled follow-ups attempted since the last successful send; the
+    # scheduler backs off further with each one
+    retry_count = Column(Integer, default=0)
+
+    __table_args__ = (
+        # status lookups (enrichment, outreach, bulk preview) use the leading column;
+        # the follow-up pipeline filters on status and last_contacted together
+        Index('ix_leads_status_last_contacted', 'status', 'last_contacted'),
+        # dashboard "Recent Activity" orders by created_at DESC
+        Index('ix_leads_created_at', 'created_at'),
+        # scheduler pulls due leads ordered by next_action_at
+        Index('ix_leads_next_action_at', 'next_action_at'),
+        # ingest dedup; NULL for leads without a website
+        Index('ux_leads_domain_key', 'domain_key', unique=True),
+    )
+
+# Hosts serving many unrelated businesses; their leads are told apart by path
+SHARED_HOSTS = (
+    'facebook.com', 'instagram.com', 'linkedin.com', 'yelp.com', 'google.com',
+    'sites.google.com', 'business.site', 'linktr.ee', 'wixsite.com', 'squarespace.com',
+    'square.site', 'godaddysites.com', 'webflow.io',
+)
+# Clinic directories and listing sites: a lead's page there is not its own site
+DIRECTORY_HOSTS = (
+    'weence.com', 'zocdoc.com', 'healthgrades.com', 'vitals.com', 'webmd.com', 'ratemds.com',
+    'doctor.com', 'sharecare.com', 'yellowpages.com', 'yp.com', 'bbb.org', 'mapquest.com',
+    'opencare.com', 'lighthouse360.com', 'nextdoor.com', 'practo.com', 'lybrate.com',
+)
+# Skipped duplicates listed by ingest_leads before it summarises the rest
+INGEST_SKIP_LOG_LIMIT = 20
+# Bump when canonical_domain changes; older databases are re-keyed on start
+# (stored in SQLite's user_version)
+DOMAIN_KEY_VERSION = 2
+# Path segments of one branch on a chain's site (x.com/locations/midtown)
+LOCATION_SEGMENTS = {'locations', 'location', 'offices', 'office', 'clinics', 'branches', 'practices'}
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'ref')
+
+def _is_shared_host(host):
+    # Email vendor domains (wix.com, zocdoc.com, ...) are never a clinic's own site either
+    return any(host == shared or host.endswith('.' + shared)
+               for shared in (*SHARED_HOSTS, *DIRECTORY_HOSTS, *VENDOR_DOMAINS))
+
+def canonical_domain(website):
+    """
+    Dedup key for a lead's website: x.com for http://x.com, https://www.x.com/
+    and https://X.com:443/?utm=maps. Shared and directory hosts and chain
+    location pages keep their path (facebook.com/smileclinic,
+    zocdoc.com/practice/x, x.com/locations/midtown), shared and directory
+    hosts also their non-tracking query (facebook.com/profile.php?id=1).
+    """
+    if not website:
+        return None
+    website = website.strip().lower()
+    if '//' not in website:
+        website = '//' + website
+    parsed = urlparse(website)
+    host = parsed.netloc.rsplit('@', 1)[-1].split(':')[0].rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    if not host:
+        return None
+
+    path = parsed.path.rstrip('/')
+    if _is_shared_host(host):
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parsed.query) if not k.startswith(TRACKING_PARAMS)
+        ))
+        return host + path + ('?' + query if query else '')
+    if LOCATION_SEGMENTS.intersection(path.split('/')):
+        return host + path
+    return host
+
+# Wait after the last email before the scheduler acts: send the next
+# follow-up, or close the lead after the final one
+FOLLOWUP_DELAYS = {
+    LeadStatus.CONTACTED.value: datetime.timedelta(days=3),
+    LeadStatus.FOLLOWUP_1.value: datetime.timedelta(days=3),
+    LeadStatus.FOLLOWUP_2.value: datetime.timedelta(days=3),
+    LeadStatus.FOLLOWUP_3.value: datetime.timedelta(days=7),
+}
+
+def next_action_time(status, last_contacted):
+    """Due time for a lead in `status` last emailed at `last_contacted`"""
+    delay = FOLLOWUP_DELAYS.get(status)
+    if delay is None or last_contacted is None:
+        return None
+    return last_contacted + delay
+
+class EventType(str, Enum):
+    SCRAPED = "scraped"
+    ENRICHED = "enriched"
+    DRAFTED = "drafted"
+    SENT = "sent"
+    FAILED = "failed"
+    REPLIED = "replied"
+
+class OutreachEvent(Base):
+    """Append-only log of pipeline events; rows are never updated"""
+    __tablename__ = 'events'
+
+    id = Column(Integer, primary_key=True)
+    lead_id = Column(Integer, nullable=True)
+    event_type = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_events_lead_id', 'lead_id'),
+        Index('ix_events_created_at', 'created_at'),
+    )
+
+class EventRollup(Base):
+    """Event counts per hour / day bucket, maintained as events are written"""
+    __tablename__ = 'event_rollups'
+
+    granularity = Column(String, nullable=False)   # 'hour' or 'day'
+    bucket_start = Column(DateTime, nullable=False)
+    event_type = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('granularity', 'event_type', 'bucket_start'),
+    )
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    INTERRUPTED = "interrupted"
+
+class Job(Base):
+    """Background job (scrape, bulk send) and its progress"""
+    __tablename__ = 'jobs'
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, default=JobStatus.QUEUED.value, nullable=False)
+    params = Column(Text)            # JSON
+    result = Column(Text)            # JSON
+    error = Column(Text)
+    total = Column(Integer, default=0)
+    done_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # "<host>:<pid>" of the process that claimed the job
+    runner = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index('ix_jobs_status', 'status'),
+    )
 
 # Ensure data directory exists
 if not os.path.exists('data'):
     os.makedirs('data')
 
-engine = create_engine('sqlite:///data/leads.db')
-Base.metadata.create_all(engine)
+DATABASE_URL = 'sqlite:///data/leads.db'
+
+# Storage profiles per process type. Every profile runs SQLite in WAL mode so
+# readers never block the writer and the UI, API and scheduler can share the
+# file; they differ in pool size and memory spent on page cache / mmap.
+ENGINE_PROFILES = {
+    'ui': {'pool_size': 5, 'max_overflow': 5, 'cache_size_kb': 16000, 'mmap_size': 64 * 1024 * 1024},
+    'api': {'pool_size': 10, 'max_overflow': 10, 'cache_size_kb': 32000, 'mmap_size': 256 * 1024 * 1024},
+    'worker': {'pool_size': 4, 'max_overflow': 4, 'cache_size_kb': 64000, 'mmap_size': 256 * 1024 * 1024},
+}
+# Chosen once per process, before the engine below is created: entry points
+# (api.py, python -m src.scheduler) set DB_PROFILE before importing this module
+DEFAULT_PROFILE = os.environ.get('DB_PROFILE', 'ui')
+BUSY_TIMEOUT_MS = 15000
+
+def _apply_pragmas(dbapi_connection, profile):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{profile['cache_size_kb']}")
+    cursor.execute(f"PRAGMA mmap_size={profile['mmap_size']}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_tuned_engine(profile_name=DEFAULT_PROFILE, url=DATABASE_URL):
+    """Create a thread-safe, pooled SQLite engine configured for `profile_name`"""
+    if profile_name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile_name}")
+    profile = ENGINE_PROFILES[profile_name]
+    tuned = create_engine(
+        url,
+        connect_args={'check_same_thread': False, 'timeout': BUSY_TIMEOUT_MS / 1000},
+        pool_size=profile['pool_size'],
+        max_overflow=profile['max_overflow'],
+        pool_recycle=3600,
+    )
+
+    @event.listens_for(tuned, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, profile)
+
+    return tuned
+
+engine = create_tuned_engine()
+
+def _add_missing_columns(bind):
+    """ALTER TABLE ... ADD COLUMN for model columns an older database lacks"""
+    added = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+                    added.append((table.name, column.name))
+    return added
+
+def _backfill_next_action_at(bind):
+    with bind.begin() as conn:
+        rows = conn.execute(
+            select(Lead.id, Lead.status, Lead.last_contacted).where(
+                Lead.status.in_(list(FOLLOWUP_DELAYS)), Lead.next_action_at.is_(None)
+            )
+        ).fetchall()
+        updates = [{'lead_id': lead_id, 'due': next_action_time(status, last_contacted)}
+                   for lead_id, status, last_contacted in rows]
+        updates = [u for u in updates if u['due'] is not None]
+        if updates:
+            conn.execute(
+                Lead.__table__.update().where(Lead.__table__.c.id == bindparam('lead_id'))
+                .values(next_action_at=bindparam('due')),
+                updates
+            )
+
+# Pipeline order used to pick which duplicate survives a merge
+_STATUS_RANK = {status.value: rank for rank, status in enumerate([
+    LeadStatus.FOUND, LeadStatus.MISSING_INFO, LeadStatus.ENRICHED, LeadStatus.CONTACTED,
+    LeadStatus.FOLLOWUP_1, LeadStatus.FOLLOWUP_2, LeadStatus.FOLLOWUP_3,
+    LeadStatus.REPLIED, LeadStatus.CLOSED,
+])}
+
+def _backfill_domain_keys(bind):
+    """
+    Fill `domain_key` for existing leads and mark leads that share one.
+
+    The lead furthest along the pipeline (then the oldest) keeps the key and
+    gets missing email/phone/name copied from its duplicates. Duplicates are
+    not deleted: they keep their fields, status and events, get
+    `duplicate_of` set to the keeper and drop out of the scheduler.
+    """
+    leads = Lead.__table__
+    keepers = leads.alias('keepers')
+    with bind.begin() as conn:
+        # Leads marked under older rules that no longer share the keeper's key
+        # (e.g. two clinics on one directory host) become leads of their own again
+        marked = conn.execute(
+            select(leads.c.id, leads.c.website, leads.c.status, leads.c.last_contacted,
+                   keepers.c.website.label('keeper_website'))
+            .join(keepers, keepers.c.id == leads.c.duplicate_of)
+        ).fetchall()
+        released = [row for row in marked
+                    if canonical_domain(row.website) != canonical_domain(row.keeper_website)]
+        for row in released:
+            conn.execute(leads.update().where(leads.c.id == row.id).values(
+                duplicate_of=None, next_action_at=next_action_time(row.status, row.last_contacted)))
+        if released:
+            print(f"🔓 Released {len(released)} leads wrongly marked as duplicates")
+
+        rows = conn.execute(
+            select(leads.c.id, leads.c.website, leads.c.status, leads.c.email, leads.c.phone, leads.c.name)
+            .where(leads.c.website.is_not(None), leads.c.duplicate_of.is_(None))
+        ).fetchall()
+        # Re-keying from scratch avoids transient clashes with keys of an older scheme
+        conn.execute(leads.update().values(domain_key=None))
+
+        groups = {}
+        for row in rows:
+            key = canonical_domain(row.website)
+            if key:
+                groups.setdefault(key, []).append(row)
+
+        keys = []
+        merged = 0
+        for key, group in groups.items():
+            group.sort(key=lambda r: (-_STATUS_RANK.get(r.status, 0), r.id))
+            keeper, duplicates = group[0], group[1:]
+            if duplicates:
+                fill = {}
+                for field in ('email', 'phone', 'name'):
+                    if not getattr(keeper, field):
+                        fill[field] = next((getattr(d, field) for d in duplicates if getattr(d, field)), None)
+                conn.execute(leads.update().where(leads.c.id.in_([d.id for d in duplicates]))
+                             .values(duplicate_of=keeper.id, next_action_at=None))
+                if any(fill.values()):
+                    conn.execute(leads.update().where(leads.c.id == keeper.id)
+                                 .values({k: v for k, v in fill.items() if v}))
+                merged += len(duplicates)
+            keys.append({'lead_id': keeper.id, 'key': key})
+
+        if keys:
+            conn.execute(
+                leads.update().where(leads.c.id == bindparam('lead_id')).values(domain_key=bindparam('key')),
+                keys
+            )
+    if merged:
+        print(f"🔗 Marked {merged} duplicate leads sharing a domain")
+    return merged
+
+def migrate_database(bind=None):
+    """Create missing tables, columns and indexes on existing databases in place"""
+    bind = bind or engine
+    Base.metadata.create_all(bind)
+    added = _add_missing_columns(bind)
+    if ('leads', 'next_action_at') in added:
+        _backfill_next_action_at(bind)
+    # Duplicates must be marked before the unique domain_key index can exist;
+    # databases keyed under older canonical_domain rules are re-keyed
+    with bind.connect() as conn:
+        key_version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if (('leads', 'domain_key') in added or ('leads', 'duplicate_of') in added
+            or key_version < DOMAIN_KEY_VERSION):
+        _backfill_domain_keys(bind)
+        with bind.connect() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {DOMAIN_KEY_VERSION}")
+            conn.commit()
+    # create_all skips indexes of tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+migrate_database()
 Session = sessionmaker(bind=engine)
 
 def get_session():
     return Session()
+
+# Touched after every write that changes leads (or, for the events file,
+# the event log and rollups) so caches in any process (analytics, Streamlit)
+# can tell their results are stale
+LEADS_VERSION_FILE = os.path.join('data', '.leads_version')
+EVENTS_VERSION_FILE = os.path.join('data', '.events_version')
+
+def _touch_version(path):
+    with open(path, 'a'):
+        os.utime(path, None)
+
+def _read_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def mark_leads_changed():
+    _touch_version(LEADS_VERSION_FILE)
+
+def leads_version():
+    return _read_version(LEADS_VERSION_FILE)
+
+def mark_events_changed():
+    _touch_version(EVENTS_VERSION_FILE)
+
+def events_version():
+    return _read_version(EVENTS_VERSION_FILE)
+
+# Rows per existence lookup / executemany batch
+INGEST_CHUNK_SIZE = 500
+
+def _dedup_key(row):
+    """Canonical domain when the lead has a website, otherwise (clinic_name, phone)"""
+    domain_key = canonical_domain(row.get('website'))
+    if domain_key:
+        return ('domain', domain_key)
+    return ('name_phone', row.get('clinic_name'), row.get('phone'))
+
+def ingest_leads(rows, session=None, chunk_size=INGEST_CHUNK_SIZE, return_ids=False):
+    """
+    Insert many lead dicts (name, clinic_name, website, email, phone, status)
+    in set-based chunks.
+
+    Leads are deduplicated on the canonical domain of their website, so
+    http://x.com, https://www.x.com/ and https://x.com/?utm=maps are one
+    lead. Existing leads are looked up with one query per chunk and the
+    insert uses ON CONFLICT DO NOTHING, so concurrent ingests cannot create
+    duplicates. Leads without a website are deduplicated on
+    (clinic_name, phone). Skipped leads are logged with their dedup key.
+    Returns (inserted_count, skipped_count), or
+    (inserted_ids, skipped_count) with `return_ids=True`.
+    """
+    own_session = session is None
+    if own_session:
+        session = get_session()
+
+    inserted_ids = []
+    skipped = 0
+    skipped_rows = []
+    seen = set()
+    now = datetime.datetime.utcnow()
+    # No conflict target: a clash on either website or domain_key skips the row
+    insert_stmt = sqlite_insert(Lead.__table__).on_conflict_do_nothing().returning(Lead.__table__.c.id)
+
+    try:
+        rows = list(rows)
+        for start in range(0, len(rows), chunk_size):
+            chunk = []
+            for row in rows[start:start + chunk_size]:
+                key = _dedup_key(row)
+                if key in seen:
+                    skipped_rows.append(row)
+                    continue
+                seen.add(key)
+                chunk.append(row)
+
+            domain_keys = [key[1] for key in map(_dedup_key, chunk) if key[0] == 'domain']
+            nameless = [r for r in chunk if _dedup_key(r)[0] == 'name_phone']
+            conditions = []
+            if domain_keys:
+                conditions.append(Lead.domain_key.in_(domain_keys))
+            if nameless:
+                conditions.append(and_(
+                    Lead.website.is_(None),
+                    Lead.clinic_name.in_({r.get('clinic_name') for r in nameless})
+                ))
+            existing = set()
+            if conditions:
+                for website, clinic_name, phone in session.query(
+                        Lead.website, Lead.clinic_name, Lead.phone).filter(or_(*conditions)):
+                    existing.add(_dedup_key({'website': website, 'clinic_name': clinic_name, 'phone': phone}))
+
+            values = [{
+                'name': r.get('name'),
+                'clinic_name': r.get('clinic_name'),
+                'website': r.get('website'),
+                'domain_key': canonical_domain(r.get('website')),
+                'email': r.get('email'),
+                'phone': r.get('phone'),
+                'status': r.get('status') or LeadStatus.FOUND.value,
+                'follow_up_count': 0,
+                'created_at': now,
+            } for r in chunk if _dedup_key(r) not in existing]
+            skipped_rows.extend(r for r in chunk if _dedup_key(r) in existing)
+
+            if values:
+                ids = session.execute(insert_stmt, values).scalars().all()
+                inserted_ids.extend(ids)
+                # Lost a race with a concurrent ingest of the same lead
+                skipped += len(values) - len(ids)
+        session.commit()
+        if inserted_ids:
+            mark_leads_changed()
+    finally:
+        if own_session:
+            session.close()
+
+    skipped += len(skipped_rows)
+    for row in skipped_rows[:INGEST_SKIP_LOG_LIMIT]:
+        print(f"⏭️ Skipped duplicate lead {row.get('clinic_name')} ({row.get('website') or row.get('phone')}), "
+              f"key {_dedup_key(row)[1]}")
+    if len(skipped_rows) > INGEST_SKIP_LOG_LIMIT:
+        print(f"⏭️ ... and {len(skipped_rows) - INGEST_SKIP_LOG_LIMIT} more duplicate leads skipped")
+
+    if return_ids:
+        return inserted_ids, skipped
+    return len(inserted_ids), skipped
+
+def leads_in_status_query(status, *columns):
+    """select() of non-duplicate leads in `status` (enrichment, outreach, bulk preview)"""
+    return select(*(columns or (Lead,))).where(Lead.status == status, Lead.duplicate_of.is_(None))
+
+def due_leads_query(now, limit):
+    """select() of leads whose next action is due, soonest first (scheduler batches)"""
+    return select(Lead).where(Lead.next_action_at <= now).order_by(Lead.next_action_at).limit(limit)
+
+# Hot queries, built from the same select()s the app runs, and the index each
+# one is expected to use
+HOT_QUERIES = {
+    'enrich_leads': (
+        leads_in_status_query(LeadStatus.FOUND.value, Lead.id, Lead.website),
+        'ix_leads_status_last_contacted',
+    ),
+    'initial_outreach / bulk_preview': (
+        leads_in_status_query(LeadStatus.ENRICHED.value),
+        'ix_leads_status_last_contacted',
+    ),
+    'run_scheduler (due leads)': (
+        due_leads_query(datetime.datetime.utcnow(), 100),
+        'ix_leads_next_action_at',
+    ),
+    'ingest_leads (existing domains)': (
+        select(Lead.website, Lead.clinic_name, Lead.phone).where(
+            Lead.domain_key.in_(['example.com', 'example.org'])),
+        'ux_leads_domain_key',
+    ),
+    'recent_activity': (
+        select(Lead).order_by(Lead.created_at.desc()).limit(10),
+        'ix_leads_created_at',
+    ),
+}
+
+def check_query_plans(bind=None):
+    """
+    Run EXPLAIN QUERY PLAN for each hot query.
+
+    Returns {name: (uses_expected_index, plan_text)}.
+    """
+    bind = bind or engine
+    results = {}
+    with bind.connect() as conn:
+        for name, (statement, index_name) in HOT_QUERIES.items():
+            sql = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            plan = "; ".join(row[-1] for row in rows)
+            results[name] = (index_name in plan, plan)
+    return results
+
+if __name__ == '__main__':
+    # python -m src.database : migrate data/leads.db and verify index usage
+    migrate_database()
+    all_ok = True
+    for name, (ok, plan) in check_query_plans().items():
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {name}: {plan}")
+    raise SystemExit(0 if all_ok else 1)
@@ -0,0 +1,130 @@
+import html
+import re
+from urllib.parse import unquote, urlparse
+
+EMAIL_RE = re.compile(r'(?<![a-zA-Z0-9._%+-])[a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,24}')
+MAILTO_RE = re.compile(r'mailto:([^"\'?<>\s]+)', re.IGNORECASE)
+# Cloudflare email obfuscation: data-cfemail="..." or /cdn-cgi/l/email-protection#...
+CFEMAIL_RE = re.compile(r'(?:data-cfemail="|email-protection#)([0-9a-fA-F]{4,})')
+# info [at] clinic [dot] com, info(at)clinic.com, info{at}clinic(dot)com.
+# Repeats are bounded so long runs of spaces, dots or word characters are
+# scanned in linear time, like EMAIL_RE
+BRACKET_AT_RE = re.compile(r'\s{0,3}[\[\(\{]\s{0,3}(?:at|@)\s{0,3}[\]\)\}]\s{0,3}', re.IGNORECASE)
+BRACKET_DOT_RE = re.compile(r'\s{0,3}[\[\(\{]\s{0,3}(?:dot|\.)\s{0,3}[\]\)\}]\s{0,3}', re.IGNORECASE)
+# info at clinic dot com; only starts at the beginning of a local-part run
+SPELLED_RE = re.compile(
+    r'(?<![a-zA-Z0-9._%+-])([a-zA-Z0-9._%+-]{1,64})\s{1,3}at\s{1,3}'
+    r'([a-zA-Z0-9-]{1,63}(?:\s{1,3}dot\s{1,3}[a-zA-Z0-9-]{1,63}){1,4})(?![a-zA-Z0-9-])',
+    re.IGNORECASE
+)
+
+ASSET_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.bmp', '.tif',
+                  '.css', '.js', '.json', '.woff', '.woff2', '.ttf', '.eot', '.mp4', '.webm', '.pdf')
+PLACEHOLDER_DOMAINS = {
+    'example.com', 'example.org', 'example.net', 'domain.com', 'yourdomain.com', 'mydomain.com',
+    'email.com', 'mysite.com', 'yoursite.com', 'website.com', 'company.com', 'address.com',
+    'sentry.io', 'sentry-next.wixpress.com', 'sentry.wixpress.com', 'wixpress.com',
+}
+# Platforms and vendors whose addresses show up in page chrome, not the clinic's own
+VENDOR_DOMAINS = {
+    'wix.com', 'squarespace.com', 'godaddy.com', 'wordpress.com', 'weebly.com', 'shopify.com',
+    'zocdoc.com', 'yelp.com', 'google.com', 'facebook.com', 'latofonts.com', 'typekit.com',
+}
+PLACEHOLDER_LOCALS = {'your', 'you', 'name', 'email', 'user', 'username', 'yourname', 'youremail',
+                      'john.doe', 'jane.doe', 'johndoe', 'firstname.lastname', 'example', 'test'}
+ROLE_LOCALS = {'info', 'contact', 'office', 'hello', 'appointments', 'appointment', 'reception',
+               'frontdesk', 'front.desk', 'admin', 'enquiries', 'inquiries', 'team'}
+NO_REPLY_LOCALS = ('noreply', 'no-reply', 'donotreply', 'do-not-reply', 'mailer-daemon')
+HEX_KEY_RE = re.compile(r'^[0-9a-f]{16,}$')
+
+# Scores at or above this come from the lead's own domain; crawling can stop
+HIGH_CONFIDENCE_SCORE = 10
+
+def _decode_cfemail(encoded):
+    try:
+        key = int(encoded[:2], 16)
+        return ''.join(chr(int(encoded[i:i + 2], 16) ^ key) for i in range(2, len(encoded) - 1, 2))
+    except ValueError:
+        return ''
+
+def decode_obfuscations(text):
+    """Turn entity-encoded, Cloudflare-protected and [at]-spelled addresses into plain ones"""
+    text = html.unescape(text)
+    extra = [_decode_cfemail(m.group(1)) for m in CFEMAIL_RE.finditer(text)]
+    extra += [unquote(m.group(1)) for m in MAILTO_RE.finditer(text)]
+    text = BRACKET_AT_RE.sub('@', text)
+    text = BRACKET_DOT_RE.sub('.', text)
+    text = SPELLED_RE.sub(
+        lambda m: m.group(1) + '@' + re.sub(r'\s{1,3}dot\s{1,3}', '.', m.group(2), flags=re.IGNORECASE), text
+    )
+    if extra:
+        text += '\n' + '\n'.join(extra)
+    return text
+
+def is_plausible_email(email):
+    """Reject asset filenames, placeholders, tracking keys and vendor addresses"""
+    local, _, domain = email.lower().rpartition('@')
+    if not local or email.lower().endswith(ASSET_SUFFIXES):
+        return False
+    if domain in PLACEHOLDER_DOMAINS or domain in VENDOR_DOMAINS:
+        return False
+    if any(domain.endswith('.' + d) for d in PLACEHOLDER_DOMAINS | VENDOR_DOMAINS):
+        return False
+    if local in PLACEHOLDER_LOCALS or HEX_KEY_RE.match(local):
+        return False
+    return True
+
+def collect_candidates(text, candidates, partial_end=False):
+    """
+    Add plausible addresses found in `text` to `candidates` ({email: {'mailto': bool}}).
+
+    With `partial_end`, a match touching the end of `text` is skipped because
+    it may continue in the next streamed chunk.
+    """
+    mailto_addresses = {unquote(m.group(1)).strip().lower() for m in MAILTO_RE.finditer(text)}
+    decoded = decode_obfuscations(text)
+    for match in EMAIL_RE.finditer(decoded):
+        if partial_end and match.end() == len(decoded):
+            continue
+        email = match.group().strip('.').lower()
+        if not is_plausible_email(email):
+            continue
+        entry = candidates.setdefault(email, {'mailto': False})
+        entry['mailto'] = entry['mailto'] or email in mailto_addresses
+    return candidates
+
+def base_domain(host):
+    """clinic.com for www.clinic.com, clinic.co.uk for shop.clinic.co.uk"""
+    labels = host.lower().split('.')
+    if labels and labels[0] == 'www':
+        labels = labels[1:]
+    # clinic.co.uk / clinic.com.au keep three labels
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in ('co', 'com', 'org', 'net', 'ac', 'gov'):
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def score_email(email, website=None, mailto=False):
+    local, _, domain = email.rpartition('@')
+    score = 0
+    if website:
+        site_host = urlparse(website if '//' in website else '//' + website).netloc.split(':')[0]
+        if site_host and base_domain(domain) == base_domain(site_host):
+            score += HIGH_CONFIDENCE_SCORE
+    if mailto:
+        score += 3
+    if local in ROLE_LOCALS:
+        score += 2
+    if local.startswith(NO_REPLY_LOCALS):
+        score -= 8
+    return score
+
+def rank_candidates(candidates, website=None):
+    """[(email, score)] best first"""
+    ranked = [(email, score_email(email, website, info['mailto'])) for email, info in candidates.items()]
+    ranked.sort(key=lambda item: -item[1])
+    return ranked
+
+def best_email(page_text, website=None):
+    """Best address on a whole page, or None"""
+    ranked = rank_candidates(collect_candidates(page_text, {}), website)
+    return ranked[0][0] if ranked else None
@@ -0,0 +1,123 @@
+import atexit
+import datetime
+import threading
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.database import OutreachEvent, EventRollup, EventType, get_session, mark_events_changed
+from src.metrics import QUEUE_DEPTH
+
+# Events are buffered in memory and written in one transaction per batch
+EVENT_BATCH_SIZE = 200
+EVENT_FLUSH_INTERVAL = 2.0   # seconds a buffered event may wait before it is written
+
+ROLLUP_GRANULARITIES = {
+    'hour': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    'day': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+_buffer = []
+_buffer_lock = threading.Lock()
+QUEUE_DEPTH.set_function(lambda: len(_buffer), queue="event_buffer")
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+
+def _flusher_loop():
+    while True:
+        _wakeup.wait(EVENT_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush_events()
+        except Exception as e:
+            print(f"⚠️ Could not write events: {e}")
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _flusher = threading.Thread(target=_flusher_loop, name="event-flusher", daemon=True)
+        _flusher.start()
+
+def record_event(event_type, lead_id=None):
+    """Queue one event; it is written by the background flusher"""
+    record_events(event_type, [lead_id])
+
+def record_events(event_type, lead_ids):
+    """Queue the same event for several leads"""
+    now = datetime.datetime.utcnow()
+    event_type = EventType(event_type).value
+    with _buffer_lock:
+        _buffer.extend((lead_id, event_type, now) for lead_id in lead_ids)
+        full = len(_buffer) >= EVENT_BATCH_SIZE
+    _ensure_flusher()
+    if full:
+        _wakeup.set()
+
+def flush_events():
+    """Write buffered events and fold them into the hour/day rollups"""
+    with _flush_lock:
+        with _buffer_lock:
+            if not _buffer:
+                return 0
+            pending = _buffer[:]
+            _buffer.clear()
+
+        increments = {}
+        for _, event_type, created_at in pending:
+            for granularity, truncate in ROLLUP_GRANULARITIES.items():
+                key = (granularity, truncate(created_at), event_type)
+                increments[key] = increments.get(key, 0) + 1
+
+        rollup_upsert = sqlite_insert(EventRollup.__table__)
+        rollup_upsert = rollup_upsert.on_conflict_do_update(
+            index_elements=['granularity', 'event_type', 'bucket_start'],
+            set_={'count': EventRollup.__table__.c.count + rollup_upsert.excluded.count}
+        )
+
+        session = get_session()
+        try:
+            session.execute(OutreachEvent.__table__.insert(), [
+                {'lead_id': lead_id, 'event_type': event_type, 'created_at': created_at}
+                for lead_id, event_type, created_at in pending
+            ])
+            session.execute(rollup_upsert, [
+                {'granularity': granularity, 'bucket_start': bucket_start,
+                 'event_type': event_type, 'count': count}
+                for (granularity, bucket_start, event_type), count in increments.items()
+            ])
+            session.commit()
+            mark_events_changed()
+        except Exception:
+            session.rollback()
+            # Put the events back so the next flush retries them
+            with _buffer_lock:
+                _buffer[:0] = pending
+            raise
+        finally:
+            session.close()
+        return len(pending)
+
+def get_event_series(event_type, granularity='day', periods=7, now=None):
+    """
+    Pre-aggregated counts for the last `periods` buckets.
+
+    Returns (bucket_starts, counts) read from the rollup table.
+    """
+    truncate = ROLLUP_GRANULARITIES[granularity]
+    step = datetime.timedelta(hours=1) if granularity == 'hour' else datetime.timedelta(days=1)
+    end = truncate(now or datetime.datetime.utcnow())
+    buckets = [end - step * i for i in range(periods - 1, -1, -1)]
+
+    session = get_session()
+    try:
+        rows = session.query(EventRollup.bucket_start, func.sum(EventRollup.count)).filter(
+            EventRollup.granularity == granularity,
+            EventRollup.event_type == EventType(event_type).value,
+            EventRollup.bucket_start >= buckets[0],
+        ).group_by(EventRollup.bucket_start).all()
+    finally:
+        session.close()
+
+    counts = {bucket_start: count for bucket_start, count in rows}
+    return buckets, [counts.get(b, 0) for b in buckets]
+
+atexit.register(flush_events)
@@ -0,0 +1,215 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+HTTP_CACHE_PATH = os.path.join('data', 'http_cache.db')
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024    # compressed bodies kept on disk
+HTTP_CACHE_FRESH_FOR = 6 * 3600             # serve without revalidating for this long
+HTTP_CACHE_COMPRESS_LEVEL = 6
+# Reads record access times in memory; they are written back in one batch
+# after this many reads or seconds, or before any store / eviction
+TOUCH_FLUSH_SIZE = 256
+TOUCH_FLUSH_SECONDS = 30
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+class HTTPCache:
+    """
+    Disk-backed cache of fetched pages, keyed by URL.
+
+    Bodies are stored zlib-compressed with their ETag/Last-Modified
+    validators. Entries younger than their freshness window are served
+    locally; older ones are revalidated with a conditional request. Once
+    the stored bodies exceed `max_bytes`, the least recently used entries
+    are evicted. Reads don't write: access times are batched in memory.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_BYTES, fresh_for=HTTP_CACHE_FRESH_FOR):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._total_bytes = None
+        self._touched = {}
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                fresh_until REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _fresh_until(self, headers, now):
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control:
+            return now
+        max_age = MAX_AGE_RE.search(cache_control)
+        if max_age:
+            return now + min(int(max_age.group(1)), self.fresh_for)
+        return now + self.fresh_for
+
+    def _touch(self, url, now):
+        with self._lock:
+            self._touched[url] = now
+            due = (len(self._touched) >= TOUCH_FLUSH_SIZE
+                   or time.monotonic() - self._last_flush >= TOUCH_FLUSH_SECONDS)
+        if due:
+            self.flush_touches()
+
+    def flush_touches(self):
+        """Write batched access times so LRU eviction sees recent reads"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if touched:
+            conn = self._conn()
+            conn.executemany('UPDATE responses SET accessed_at = ? WHERE url = ?',
+                             [(at, url) for url, at in touched.items()])
+            conn.commit()
+
+    def get(self, url):
+        """
+        Cached entry for `url` as a dict (content_type, etag, last_modified,
+        body, fresh), or None. Stale entries are returned with fresh=False so
+        the caller can revalidate them.
+        """
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT content_type, etag, last_modified, body, fresh_until FROM responses WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._touch(url, now)
+        fresh = now < row[4]
+        with self._lock:
+            # A stale entry counts as a miss until refresh() turns it into a revalidation
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return {
+            'content_type': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'body': zlib.decompress(row[3]),
+            'fresh': fresh,
+        }
+
+    @staticmethod
+    def conditional_headers(entry):
+        """If-None-Match / If-Modified-Since headers for revalidating `entry`"""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def refresh(self, url, headers):
+        """Record a 304 for `url`: the stored body is good for another window"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'UPDATE responses SET fetched_at = ?, fresh_until = ?, accessed_at = ? WHERE url = ?',
+            (now, self._fresh_until(headers, now), now, url)
+        )
+        conn.commit()
+        with self._lock:
+            self.revalidated += 1
+            self.misses -= 1
+
+    def store(self, url, headers, body):
+        """Save a 200 response; responses marked no-store are skipped"""
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            return
+        self.flush_touches()
+        now = time.time()
+        compressed = zlib.compress(body, HTTP_CACHE_COMPRESS_LEVEL)
+        conn = self._conn()
+        previous = conn.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses '
+            '(url, content_type, etag, last_modified, body, size, fetched_at, fresh_until, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (url, headers.get('Content-Type', ''), headers.get('ETag'), headers.get('Last-Modified'),
+             compressed, len(compressed), now, self._fresh_until(headers, now), now)
+        )
+        conn.commit()
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            else:
+                self._total_bytes += len(compressed) - (previous[0] if previous else 0)
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache is under 90% of `max_bytes`"""
+        self.flush_touches()
+        conn = self._conn()
+        target = int(self.max_bytes * 0.9)
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total > target:
+            victims = []
+            for url, size in conn.execute('SELECT url, size FROM responses ORDER BY accessed_at'):
+                if total <= target:
+                    break
+                victims.append((url,))
+                total -= size
+            conn.executemany('DELETE FROM responses WHERE url = ?', victims)
+            conn.commit()
+            print(f"🧹 HTTP cache evicted {len(victims)} pages")
+        with self._lock:
+            self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+        conn = self._conn()
+        conn.execute('DELETE FROM responses')
+        conn.commit()
+        with self._lock:
+            self._total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            'bytes': self._total_bytes,
+        }
+
+http_cache = HTTPCache()
@@ -0,0 +1,273 @@
+import datetime
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from src.database import Job, JobStatus, get_session
+from src.metrics import STAGE_EVENTS, QUEUE_DEPTH
+
+# Jobs running at the same time in this process
+JOB_WORKERS = 2
+# Minimum seconds between progress writes for one job
+PROGRESS_WRITE_INTERVAL = 0.5
+
+_executor = None
+_executor_lock = threading.Lock()
+_handlers = {}
+_recovered = False
+_recovery_lock = threading.Lock()
+
+def job_handler(kind):
+    """Register `func(params, progress)` as the handler for `kind` jobs"""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+class JobProgress:
+    """Progress reporter handed to job handlers; persists counts periodically"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+        self.save(force=True)
+
+    def advance(self, success=True, count=1):
+        with self._lock:
+            self.done += count
+            if not success:
+                self.failed += count
+        self.save()
+
+    def update(self, done, total):
+        """Set absolute progress (for work that reports done/total itself)"""
+        with self._lock:
+            self.done = done
+            self.total = total
+        self.save(force=done == 0 or done == total)
+
+    def save(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        with self._lock:
+            values = {'total': self.total, 'done_count': self.done, 'failed_count': self.failed}
+        _update_job(self.job_id, **values)
+
+def _update_job(job_id, **values):
+    session = get_session()
+    try:
+        session.query(Job).filter_by(id=job_id).update(values)
+        session.commit()
+    finally:
+        session.close()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+def _submit(job_id, kind, params):
+    QUEUE_DEPTH.inc(queue="jobs_queued")
+    _get_executor().submit(_run_job, job_id, kind, params)
+
+def _runner_id():
+    # Read per call: worker processes forked after import have their own pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _runner_alive(runner):
+    """False when `runner` is a process on this host that no longer exists"""
+    host, _, pid = (runner or '').rpartition(':')
+    if not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _claim_job(job_id):
+    """Move a queued job to running for this process; False if another process got it first"""
+    session = get_session()
+    try:
+        claimed = session.query(Job).filter_by(id=job_id, status=JobStatus.QUEUED.value).update({
+            'status': JobStatus.RUNNING.value,
+            'started_at': datetime.datetime.utcnow(),
+            'runner': _runner_id(),
+        })
+        session.commit()
+        return claimed == 1
+    finally:
+        session.close()
+
+def _run_job(job_id, kind, params):
+    QUEUE_DEPTH.dec(queue="jobs_queued")
+    if not _claim_job(job_id):
+        return
+    progress = JobProgress(job_id)
+    try:
+        with QUEUE_DEPTH.track_inprogress(queue="jobs_running"):
+            result = _handlers[kind](params, progress)
+        progress.save(force=True)
+        _update_job(job_id, status=JobStatus.SUCCEEDED.value, result=json.dumps(result),
+                    finished_at=datetime.datetime.utcnow())
+        STAGE_EVENTS.inc(stage=f"job_{kind}", outcome="success")
+    except Exception as e:
+        print(f"❌ Job {job_id} ({kind}) failed: {e}")
+        progress.save(force=True)
+        _update_job(job_id, status=JobStatus.FAILED.value, error=str(e),
+                    finished_at=datetime.datetime.utcnow())
+        STAGE_EVENTS.inc(stage=f"job_{kind}", outcome="failure")
+
+def submit_job(kind, params=None):
+    """Persist a job and queue it on the worker pool; returns the job id"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    params = params or {}
+    job_id = uuid.uuid4().hex
+
+    session = get_session()
+    try:
+        session.add(Job(id=job_id, kind=kind, status=JobStatus.QUEUED.value, params=json.dumps(params)))
+        session.commit()
+    finally:
+        session.close()
+
+    _submit(job_id, kind, params)
+    return job_id
+
+def _job_to_dict(job):
+    eta_seconds = None
+    if job.status == JobStatus.RUNNING.value and job.started_at and job.done_count and job.total:
+        elapsed = (datetime.datetime.utcnow() - job.started_at).total_seconds()
+        eta_seconds = round(elapsed / job.done_count * max(job.total - job.done_count, 0), 1)
+
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'params': json.loads(job.params) if job.params else {},
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'total': job.total,
+        'done': job.done_count,
+        'failed': job.failed_count,
+        'eta_seconds': eta_seconds,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def get_job(job_id):
+    session = get_session()
+    try:
+        job = session.query(Job).filter_by(id=job_id).first()
+        return _job_to_dict(job) if job else None
+    finally:
+        session.close()
+
+def list_jobs(limit=20):
+    session = get_session()
+    try:
+        jobs = session.query(Job).order_by(Job.created_at.desc()).limit(limit).all()
+        return [_job_to_dict(job) for job in jobs]
+    finally:
+        session.close()
+
+def recover_jobs():
+    """
+    Resume after a restart: queued jobs are re-submitted, jobs whose runner
+    process is gone are marked interrupted (re-running a half-finished bulk
+    send could email leads twice).
+
+    Safe to run from several processes at once: jobs still running in a
+    live process are left alone, and each queued job is claimed by exactly
+    one process when it starts.
+    """
+    session = get_session()
+    try:
+        running = session.query(Job.id, Job.runner).filter_by(status=JobStatus.RUNNING.value).all()
+        orphaned = [job_id for job_id, runner in running if not _runner_alive(runner)]
+        if orphaned:
+            session.query(Job).filter(
+                Job.id.in_(orphaned), Job.status == JobStatus.RUNNING.value
+            ).update({
+                'status': JobStatus.INTERRUPTED.value,
+                'error': 'Interrupted by a restart',
+                'finished_at': datetime.datetime.utcnow(),
+            }, synchronize_session=False)
+            session.commit()
+        queued = session.query(Job.id, Job.kind, Job.params).filter_by(status=JobStatus.QUEUED.value).all()
+    finally:
+        session.close()
+
+    for job_id, kind, params in queued:
+        if kind in _handlers:
+            _submit(job_id, kind, json.loads(params) if params else {})
+    return len(queued)
+
+def recover_jobs_once():
+    """recover_jobs() the first time it is called in this process; returns jobs resumed"""
+    global _recovered
+    with _recovery_lock:
+        if _recovered:
+            return 0
+        _recovered = True
+    resumed = recover_jobs()
+    if resumed:
+        print(f"🔁 Resumed {resumed} queued jobs")
+    return resumed
+
+# ===== Job handlers =====
+
+@job_handler('scrape')
+def _scrape_job(params, progress):
+    from src.scraper import process_scraping_job, enrich_leads, serp_cache, SERP_MAX_PAGES
+    from src.secrets_loader import get_secret
+
+    new_leads = process_scraping_job(
+        params.get('queries') or params['query'], get_secret("SERP_API_KEY"),
+        locations=params.get('locations'), max_pages=params.get('max_pages', SERP_MAX_PAGES),
+        refresh=params.get('refresh', False)
+    )
+    enriched = enrich_leads(on_progress=progress.update)
+    return {'count': new_leads, 'enriched': enriched, 'serp_cache': serp_cache.stats()}
+
+@job_handler('bulk_send')
+def _bulk_send_job(params, progress):
+    from src.database import Lead
+    from src.agent import generate_personalized_emails, get_email_body
+    from src.mailer import send_bulk_emails
+
+    session = get_session()
+    leads = session.query(Lead).filter(Lead.id.in_(params['lead_ids'])).all()
+    progress.set_total(len(leads))
+
+    # Generate emails in batched Gemini calls
+    openings = generate_personalized_emails(leads)
+    messages = [(lead.id, f"Question for {lead.clinic_name}", get_email_body(lead, openings[lead.id]))
+                for lead in leads]
+    session.close()
+
+    sent_count, failed_count = send_bulk_emails(
+        messages, on_result=lambda lead_id, success: progress.advance(success)
+    )
+    return {'sent': sent_count, 'failed': failed_count}
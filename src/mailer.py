@@ -1,46 +1,164 @@
 import smtplib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import streamlit as st
 import datetime
-from src.database import Lead, LeadStatus, get_session
+from src.database import Lead, LeadStatus, EventType, get_session, mark_leads_changed, next_action_time
+from src.events import record_event, flush_events
+from src.ratelimit import send_governor
+from src.metrics import STAGE_EVENTS, STAGE_SECONDS, QUEUE_DEPTH
 
-def send_outreach_email(lead_id, subject, html_content):
-    """Send email via SMTP and update lead status"""
+# SMTP pooling defaults
+SMTP_POOL_SIZE = 3               # sessions allowed to send in parallel
+SMTP_MAX_MESSAGES = 50           # recycle a session after this many messages
+SMTP_TIMEOUT = 30                # seconds for connect / commands
+
+# Sends blocked waiting for a rate-limit token
+QUEUE_DEPTH.set_function(lambda: send_governor.metrics()['queue_depth'], queue="send_rate_limit")
+
+def _smtp_settings():
+    """Read SMTP credentials from secrets"""
+    return {
+        "server": st.secrets["SMTP_SERVER"],
+        "port": st.secrets["SMTP_PORT"],
+        "username": st.secrets["SMTP_USERNAME"],
+        "password": st.secrets["SMTP_PASSWORD"],
+        "from_email": st.secrets["SMTP_FROM_EMAIL"],
+        "from_name": st.secrets.get("SMTP_FROM_NAME", "Lead Generation"),
+    }
+
+class _PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+
+class SMTPPool:
+    """
+    Keeps authenticated SMTP sessions open across a batch of sends.
+
+    At most `size` sessions exist at once; each one is recycled after
+    `max_messages` sends and reopened transparently if the server drops it.
+    Use as a context manager so idle sessions are closed at the end.
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE, max_messages=SMTP_MAX_MESSAGES, settings=None):
+        self.size = max(1, size)
+        self.max_messages = max_messages
+        self._settings = settings
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = _smtp_settings()
+        return self._settings
+
+    def _connect(self):
+        cfg = self.settings
+        server = smtplib.SMTP(cfg["server"], cfg["port"], timeout=SMTP_TIMEOUT)
+        server.starttls()  # Secure the connection
+        server.login(cfg["username"], cfg["password"])
+        return _PooledConnection(server)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.server.quit()
+        except Exception:
+            try:
+                conn.server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def send(self, message):
+        """Send a prepared message on a pooled session"""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                try:
+                    conn.server.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    # Idle session was dropped by the server - reconnect once
+                    self._discard(conn)
+                    conn = self._connect()
+                    conn.server.send_message(message)
+            except Exception:
+                self._discard(conn)
+                raise
+
+            conn.sent += 1
+            if conn.sent >= self.max_messages:
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def send_outreach_email(lead_id, subject, html_content, pool=None):
+    """Send email via SMTP and update lead status.
+
+    Pass a shared `SMTPPool` to reuse sessions across a batch; without one
+    a single-use connection is opened for this email.
+    """
     session = get_session()
     lead = session.query(Lead).filter_by(id=lead_id).first()
     
     if not lead or not lead.email:
         print(f"❌ Cannot send email - Lead {lead_id}: No email address")
+        record_event(EventType.FAILED, lead_id)
+        STAGE_EVENTS.inc(stage="send", outcome="no_email")
+        session.close()
         return False
     
+    own_pool = pool is None
+    if own_pool:
+        pool = SMTPPool(size=1)
+
     try:
-        # Get SMTP credentials from secrets
-        smtp_server = st.secrets["SMTP_SERVER"]
-        smtp_port = st.secrets["SMTP_PORT"]
-        smtp_username = st.secrets["SMTP_USERNAME"]
-        smtp_password = st.secrets["SMTP_PASSWORD"]
-        from_email = st.secrets["SMTP_FROM_EMAIL"]
-        from_name = st.secrets.get("SMTP_FROM_NAME", "Lead Generation")
+        cfg = pool.settings
         
         # Create message
         message = MIMEMultipart("alternative")
         message["Subject"] = subject
-        message["From"] = f"{from_name} <{from_email}>"
+        message["From"] = f"{cfg['from_name']} <{cfg['from_email']}>"
         message["To"] = lead.email
         
         # Attach HTML content
         html_part = MIMEText(html_content, "html")
         message.attach(html_part)
         
-        print(f"📧 Sending email to {lead.clinic_name} ({lead.email})...")
-        
-        # Connect to SMTP server and send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()  # Secure the connection
-            server.login(smtp_username, smtp_password)
-            server.send_message(message)
+        # Wait for the global, per-account and per-domain send budgets
+        send_governor.acquire(
+            account=f"{cfg['username']}@{cfg['server']}",
+            domain=lead.email.rsplit("@", 1)[-1]
+        )
         
+        print(f"📧 Sending email to {lead.clinic_name} ({lead.email})...")
+        with STAGE_SECONDS.time(stage="send"):
+            pool.send(message)
+        send_governor.record_sent()
         print(f"✅ Email sent successfully to {lead.email}")
         
         # Update lead status
@@ -54,10 +172,50 @@ def send_outreach_email(lead_id, subject, html_content):
             lead.status = LeadStatus.FOLLOWUP_3.value
             
         lead.last_contacted = datetime.datetime.utcnow()
+        lead.next_action_at = next_action_time(lead.status, lead.last_contacted)
         lead.follow_up_count += 1
+        lead.retry_count = 0
         session.commit()
+        mark_leads_changed()
+        record_event(EventType.SENT, lead_id)
+        STAGE_EVENTS.inc(stage="send", outcome="success")
         return True
         
     except Exception as e:
         print(f"❌ Error sending email to {lead.clinic_name}: {e}")
+        record_event(EventType.FAILED, lead_id)
+        STAGE_EVENTS.inc(stage="send", outcome="failure")
         return False
+    finally:
+        if own_pool:
+            pool.close()
+        session.close()
+
+def send_bulk_emails(messages, max_parallel=SMTP_POOL_SIZE, on_result=None):
+    """
+    Send (lead_id, subject, html_content) tuples over a shared SMTP pool.
+
+    `on_result(lead_id, success)` is called from the caller's thread as each
+    email finishes. Returns (sent_count, failed_count).
+    """
+    sent_count = 0
+    failed_count = 0
+    if not messages:
+        return sent_count, failed_count
+
+    with SMTPPool(size=max_parallel) as pool, ThreadPoolExecutor(max_workers=pool.size) as executor:
+        futures = {
+            executor.submit(send_outreach_email, lead_id, subject, body, pool): lead_id
+            for lead_id, subject, body in messages
+        }
+        for future in as_completed(futures):
+            success = future.result()
+            if success:
+                sent_count += 1
+            else:
+                failed_count += 1
+            if on_result:
+                on_result(futures[future], success)
+
+    flush_events()
+    return sent_count, failed_count
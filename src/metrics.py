@@ -0,0 +1,186 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond cache hits up to slow crawls and LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    """Monotonic count, e.g. leadgen_stage_events_total{stage="send",outcome="success"}"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_label_text(self.labelnames, key)} {value}' for key, value in items]
+
+class Gauge(_Metric):
+    """
+    Current value. Either set/inc/dec it, or give it a callback with
+    `set_function` that is read at scrape time (zero cost on the hot path).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        self._functions[self._key(labels)] = fn
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, fn in list(self._functions.items()):
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return [f'{self.name}{_label_text(self.labelnames, key)} {value}' for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    """Latency distribution with cumulative buckets, sum and count per label set"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, seconds, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _label_text(self.labelnames + ('le',), key + (le,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            base = _label_text(self.labelnames, key)
+            lines.append(f'{self.name}_sum{base} {series[-1]}')
+            lines.append(f'{self.name}_count{base} {cumulative}')
+        return lines
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+# ===== Pipeline metrics =====
+
+# stage: scrape, serp_request, fetch, extract, generate, send, schedule
+STAGE_SECONDS = Histogram(
+    'leadgen_stage_duration_seconds', 'Time spent per pipeline stage call', ['stage']
+)
+# outcome: success, failure, fallback, cached, ...
+STAGE_EVENTS = Counter(
+    'leadgen_stage_events_total', 'Pipeline stage outcomes', ['stage', 'outcome']
+)
+QUEUE_DEPTH = Gauge(
+    'leadgen_queue_depth', 'Work waiting or in flight per queue', ['queue']
+)
+# cache: openings, serp_results; result: hit, miss (since process start)
+CACHE_LOOKUPS = Gauge(
+    'leadgen_cache_lookups', 'Persistent cache lookups in this process', ['cache', 'result']
+)
+
+@contextmanager
+def track_stage(stage):
+    """Time a stage call; counts it as a failure if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_EVENTS.inc(stage=stage, outcome='failure')
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from src.secrets_loader import get_secret
+
+# Seconds of send history kept for throughput metrics
+METRICS_WINDOW = 60
+# How often idle per-account / per-domain buckets are swept
+IDLE_SWEEP_SECONDS = 60
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity` banked"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """A full bucket behaves exactly like a new one, so it can be dropped"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class SendGovernor:
+    """
+    Paces outgoing email with three layers of token buckets: one global,
+    one per SMTP account and one per recipient domain.
+
+    acquire() blocks until every bucket that applies has a token, so sends
+    queue up instead of failing when a limit is reached; record_sent() counts
+    the sends that actually went out.
+
+    Budgets are per process: the Streamlit UI, the API and the scheduler
+    daemon each pace their own sends, so the combined rate can reach the
+    configured rate times the number of processes sending at once. Scale
+    SEND_RATE_PER_SECOND and the per-minute limits down accordingly when
+    running several of them against one SMTP account.
+    """
+
+    def __init__(self, global_rate, global_burst, account_rate, domain_rate):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.account_rate = account_rate
+        self.domain_rate = domain_rate
+        self._accounts = {}
+        self._domains = {}
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._sent_times = deque()
+        self._sent_total = 0
+        self._acquired_total = 0
+        self._wait_total = 0.0
+        self._last_sweep = time.monotonic()
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            global_rate=float(get_secret("SEND_RATE_PER_SECOND", 2)),
+            global_burst=float(get_secret("SEND_BURST", 5)),
+            account_rate=float(get_secret("SMTP_ACCOUNT_RATE_PER_MINUTE", 60)) / 60,
+            domain_rate=float(get_secret("RECIPIENT_DOMAIN_RATE_PER_MINUTE", 20)) / 60,
+        )
+
+    def _buckets(self, account, domain):
+        buckets = [self.global_bucket]
+        if account:
+            if account not in self._accounts:
+                self._accounts[account] = TokenBucket(self.account_rate)
+            buckets.append(self._accounts[account])
+        if domain:
+            domain = domain.lower()
+            if domain not in self._domains:
+                self._domains[domain] = TokenBucket(self.domain_rate)
+            buckets.append(self._domains[domain])
+        return buckets
+
+    def _sweep(self, now):
+        """Drop idle buckets and send history older than METRICS_WINDOW"""
+        while self._sent_times and now - self._sent_times[0] > METRICS_WINDOW:
+            self._sent_times.popleft()
+        if now - self._last_sweep < IDLE_SWEEP_SECONDS:
+            return
+        self._last_sweep = now
+        for buckets in (self._accounts, self._domains):
+            for key in [key for key, bucket in buckets.items() if bucket.is_full(now)]:
+                del buckets[key]
+
+    def acquire(self, account=None, domain=None):
+        """Block until a send to `domain` through `account` is allowed"""
+        started = time.monotonic()
+        with self._cond:
+            self._queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    buckets = self._buckets(account, domain)
+                    wait = max(bucket.wait_time(now) for bucket in buckets)
+                    if wait <= 0:
+                        for bucket in buckets:
+                            bucket.take()
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._queued -= 1
+
+            now = time.monotonic()
+            self._wait_total += now - started
+            self._acquired_total += 1
+            self._sweep(now)
+            # Let other waiters re-check; a bucket they wait on may have refilled
+            self._cond.notify_all()
+
+    def record_sent(self):
+        """Count one email the SMTP server accepted"""
+        with self._cond:
+            now = time.monotonic()
+            self._sent_total += 1
+            self._sent_times.append(now)
+            self._sweep(now)
+
+    def metrics(self):
+        """Live throughput and queue depth for this process"""
+        with self._cond:
+            self._sweep(time.monotonic())
+            recent = len(self._sent_times)
+            return {
+                'queue_depth': self._queued,
+                'sent_total': self._sent_total,
+                f'sent_last_{METRICS_WINDOW}s': recent,
+                'throughput_per_second': round(recent / METRICS_WINDOW, 3),
+                'avg_wait_seconds': round(self._wait_total / self._acquired_total, 3) if self._acquired_total else 0.0,
+                'tracked_domains': len(self._domains),
+            }
+
+# Shared by every send in this process (not across processes, see SendGovernor)
+send_governor = SendGovernor.from_config()
@@ -1,57 +1,147 @@
 import datetime
-from src.database import Lead, LeadStatus, get_session
-from src.mailer import send_outreach_email
-from src.agent import generate_personalized_email, get_email_body
+import os
+import threading
+if __name__ == '__main__':
+    # Storage profile for the daemon; must be set before src.database is imported
+    os.environ.setdefault('DB_PROFILE', 'worker')
+from sqlalchemy import func
+from src.database import Lead, LeadStatus, get_session, mark_leads_changed, due_leads_query, leads_in_status_query
+from src.mailer import send_bulk_emails
+from src.agent import generate_personalized_emails, get_email_body
+from src.metrics import STAGE_EVENTS, track_stage
 
-def run_scheduler():
-    session = get_session()
-    now = datetime.datetime.utcnow()
-    
-    # Logic: 
+# Due leads handled per transaction
+SCHEDULER_BATCH_SIZE = 100
+# A failed follow-up is retried after this long instead of blocking the queue,
+# doubling with each further failure up to MAX_RETRY_DELAY
+RETRY_DELAY = datetime.timedelta(hours=1)
+MAX_RETRY_DELAY = datetime.timedelta(days=1)
+# Longest the daemon sleeps without re-reading the next deadline
+MAX_SLEEP_SECONDS = 3600
+# Shortest daemon sleep, even when a deadline has already passed; after a
+# scheduler error the sleep doubles from here up to MAX_SLEEP_SECONDS
+MIN_SLEEP_SECONDS = 30
+
+def _retry_delay(retries):
+    """Backoff before the next attempt when `retries` attempts already failed"""
+    return min(RETRY_DELAY * 2 ** min(retries, 16), MAX_RETRY_DELAY)
+
+def _process_due_batch(session, now, batch_size):
+    """Handle one batch of due leads; returns how many were due"""
+    # Logic (due times are set by the mailer, see FOLLOWUP_DELAYS):
     # 1. Contacted -> Followup_1 (Wait 3 days)
     # 2. Followup_1 -> Followup_2 (Wait 3 days)
     # 3. Followup_2 -> Followup_3 (Wait 3 days)
     # 4. Followup_3 and no reply after 7 days -> Closed
-    
-    leads_to_followup = session.query(Lead).filter(
-        Lead.status.in_([
-            LeadStatus.CONTACTED, 
-            LeadStatus.FOLLOWUP_1, 
-            LeadStatus.FOLLOWUP_2,
-            LeadStatus.FOLLOWUP_3
-        ])
-    ).all()
-    
-    for lead in leads_to_followup:
-        days_since_contact = (now - lead.last_contacted).days
-        
-        if lead.status == LeadStatus.FOLLOWUP_3:
-            if days_since_contact >= 7:
-                lead.status = LeadStatus.CLOSED
-                session.commit()
-            continue
-            
-        if days_since_contact >= 3:
+    due_leads = session.scalars(due_leads_query(now, batch_size)).all()
+    if not due_leads:
+        return 0
+
+    messages = []
+    for lead in due_leads:
+        if lead.status == LeadStatus.FOLLOWUP_3.value:
+            lead.status = LeadStatus.CLOSED.value
+            lead.next_action_at = None
+        elif lead.status in (LeadStatus.CONTACTED.value, LeadStatus.FOLLOWUP_1.value,
+                             LeadStatus.FOLLOWUP_2.value):
             # Generate follow up email (simplified for now, could use Gemini again)
             subject = f"Following up: Helping {lead.clinic_name}"
             opening = f"Hi {lead.name}, just following up on my previous email."
             body = get_email_body(lead, opening)
-            
-            send_outreach_email(lead.id, subject, body)
-            
+            messages.append((lead.id, subject, body))
+            # Pushed back now so a failed send is retried later, not in this run;
+            # a successful send replaces it with the next follow-up time and
+            # resets retry_count
+            retries = lead.retry_count or 0
+            lead.next_action_at = now + _retry_delay(retries)
+            lead.retry_count = retries + 1
+        else:
+            # Replied, closed or otherwise out of the sequence
+            lead.next_action_at = None
+
+    # Closings and reschedules for the whole batch commit together
     session.commit()
+    mark_leads_changed()
+    STAGE_EVENTS.inc(len(messages), stage="schedule", outcome="followup")
+    STAGE_EVENTS.inc(len(due_leads) - len(messages), stage="schedule", outcome="closed")
+
+    if messages:
+        send_bulk_emails(messages)
+    return len(due_leads)
+
+def run_scheduler(now=None, batch_size=SCHEDULER_BATCH_SIZE):
+    """
+    Process every lead whose follow-up is due, in SQL-ordered batches.
+
+    Cost depends on the number of due leads, not the size of the pipeline.
+    Returns the number of leads processed.
+    """
+    now = now or datetime.datetime.utcnow()
+    session = get_session()
+    processed = 0
+    try:
+        while True:
+            with track_stage("schedule"):
+                count = _process_due_batch(session, now, batch_size)
+            processed += count
+            if count < batch_size:
+                break
+    finally:
+        session.close()
+    return processed
+
+def next_due_time():
+    """Earliest pending next_action_at, or None"""
+    session = get_session()
+    try:
+        return session.query(func.min(Lead.next_action_at)).scalar()
+    finally:
+        session.close()
+
+def run_scheduler_daemon(stop_event=None):
+    """Run the follow-up scheduler continuously, sleeping until the next deadline"""
+    stop_event = stop_event or threading.Event()
+    print("⏰ Follow-up scheduler started")
+    errors = 0
+    while not stop_event.is_set():
+        try:
+            processed = run_scheduler()
+            if processed:
+                print(f"✅ Scheduler processed {processed} due leads")
+            due = next_due_time()
+            errors = 0
+        except Exception as e:
+            errors += 1
+            print(f"❌ Scheduler error: {e}")
+
+        if errors:
+            # Due leads may not have been rescheduled, so back off instead of retrying at once
+            sleep_for = MIN_SLEEP_SECONDS * 2 ** min(errors - 1, 16)
+        elif due is None:
+            sleep_for = MAX_SLEEP_SECONDS
+        else:
+            sleep_for = (due - datetime.datetime.utcnow()).total_seconds()
+        stop_event.wait(min(max(sleep_for, MIN_SLEEP_SECONDS), MAX_SLEEP_SECONDS))
 
 def process_initial_outreach():
     session = get_session()
-    leads_to_contact = session.query(Lead).filter_by(status=LeadStatus.ENRICHED).all()
+    leads_to_contact = session.scalars(leads_in_status_query(LeadStatus.ENRICHED.value)).all()
     
-    count = 0
+    openings = generate_personalized_emails(leads_to_contact)
+    messages = []
     for lead in leads_to_contact:
-        opening = generate_personalized_email(lead.name, lead.clinic_name)
+        opening = openings[lead.id]
         subject = f"Question for {lead.clinic_name}"
         body = get_email_body(lead, opening)
-        
-        if send_outreach_email(lead.id, subject, body):
-            count += 1
-            
+        messages.append((lead.id, subject, body))
+    session.close()
+
+    count, _ = send_bulk_emails(messages)
     return count
+
+if __name__ == '__main__':
+    # python -m src.scheduler : long-running follow-up sender
+    try:
+        run_scheduler_daemon()
+    except KeyboardInterrupt:
+        print("👋 Scheduler stopped")
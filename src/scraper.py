@@ -1,90 +1,639 @@
 import requests
-from bs4 import BeautifulSoup
 import re
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
 from serpapi import GoogleSearch
-from src.database import Lead, LeadStatus, get_session
+from src.database import Lead, LeadStatus, EventType, get_session, ingest_leads, mark_leads_changed, canonical_domain, leads_in_status_query
+from src.events import record_events, flush_events
+from src.http_cache import http_cache
+from src.cache import PersistentCache, make_key
+from src.secrets_loader import get_secret
+from src.metrics import CACHE_LOOKUPS, STAGE_EVENTS, STAGE_SECONDS, QUEUE_DEPTH, track_stage
+from src.email_extractor import collect_candidates, rank_candidates, base_domain, HIGH_CONFIDENCE_SCORE
 import streamlit as st
 
-def search_leads(query, api_key):
+# Enrichment concurrency defaults
+ENRICH_MAX_WORKERS = 16      # global cap on in-flight website fetches
+ENRICH_PER_HOST = 2          # cap on concurrent fetches against one host
+ENRICH_DEADLINE = 600        # seconds for the whole enrichment run
+ENRICH_BATCH_SIZE = 25       # commit after this many finished leads
+
+# Website fetch limits
+FETCH_TIMEOUT = (5, 10)                  # connect / read seconds
+FETCH_MAX_BYTES = 512 * 1024             # stop reading a page after this many bytes
+FETCH_CHUNK_SIZE = 16 * 1024
+FETCH_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+FETCH_HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; LeadGenBot/1.0)'}
+# Product token matched against robots.txt User-agent lines; the full UA
+# string would be reduced to 'mozilla' by RobotFileParser
+ROBOTS_USER_AGENT = 'LeadGenBot'
+
+# SerpAPI fan-out limits
+SERP_MAX_PAGES = 1           # result pages followed per query unless a caller asks for more
+SERP_PAGE_LIMIT = 10         # most result pages a caller may ask for per query
+SERP_PAGE_SIZE = 20          # google_maps results per page ("start" offset step)
+SERP_CONCURRENCY = 4         # SerpAPI requests in flight
+SERP_QUOTA = 30              # SerpAPI requests per scraping job
+SERP_CACHE_TTL = float(get_secret("SERP_CACHE_TTL_HOURS", 72)) * 3600
+
+serp_cache = PersistentCache('serp_results', ttl=SERP_CACHE_TTL, max_entries=20000)
+CACHE_LOOKUPS.set_function(lambda: serp_cache.hits, cache="serp_results", result="hit")
+CACHE_LOOKUPS.set_function(lambda: serp_cache.misses, cache="serp_results", result="miss")
+
+# Chunks overlap by this much so an address split across two reads is still seen
+CHUNK_OVERLAP = 512
+
+# Contact-page crawl limits, per lead website
+CRAWL_MAX_DEPTH = 1          # link hops away from the home page
+CRAWL_MAX_PAGES = 4          # pages fetched per site, home page included
+CRAWL_PARALLEL = 3           # pages of one site fetched at once
+CRAWL_HOST_DELAY = 0.5       # seconds between requests to the same host
+ROBOTS_CACHE_SIZE = 5000
+# Links worth following, best first
+CONTACT_KEYWORDS = ('contact', 'kontakt', 'impressum', 'imprint', 'about', 'team', 'staff',
+                    'location', 'appointment', 'book')
+LINK_RE = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\'>]+)["\'][^>]*>([^<]{0,100})', re.IGNORECASE)
+
+def serpapi_client(params):
+    """Default SerpAPI transport; swap in any callable(params) -> dict for testing"""
+    return GoogleSearch(params).get_dict()
+
+def _parse_local_results(results):
+    leads = []
+    for result in results.get("local_results", []):
+        leads.append({
+            "name": result.get("title"),
+            "clinic_name": result.get("title"),
+            "website": result.get("website"),
+            "phone": result.get("phone"),
+            "place_id": result.get("place_id"),
+        })
+    return leads
+
+def _search_params(query, start=0):
     params = {
         "engine": "google_maps",
         "q": query,
         "type": "search",
-        "api_key": api_key
     }
-    
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    
+    if start:
+        params["start"] = start
+    return params
+
+def _serp_cache_key(params):
+    """Same key for queries differing only in case or spacing; the API key is never part of it"""
+    normalized = {k: ' '.join(str(v).lower().split()) for k, v in params.items() if k != "api_key"}
+    return make_key('google_maps', normalized)
+
+def _search_page(query, api_key, client=None, start=0, refresh=False):
+    """
+    Raw results for one page of `query`, from the SerpAPI result cache
+    unless `refresh` is set. Successful responses are cached.
+    """
+    params = _search_params(query, start)
+    cache_key = _serp_cache_key(params)
+    if not refresh:
+        cached = serp_cache.get(cache_key)
+        if cached is not None:
+            STAGE_EVENTS.inc(stage="serp_request", outcome="cached")
+            return cached
+
+    with track_stage("serp_request"):
+        results = (client or serpapi_client)(dict(params, api_key=api_key))
+    STAGE_EVENTS.inc(stage="serp_request", outcome="failure" if "error" in results else "success")
+    if "error" not in results:
+        serp_cache.set(cache_key, {
+            "local_results": results.get("local_results", []),
+            "serpapi_pagination": results.get("serpapi_pagination", {}),
+        })
+    return results
+
+def search_leads(query, api_key, client=None, start=0, refresh=False):
+    """One page of Google Maps results for `query`"""
+    return _parse_local_results(_search_page(query, api_key, client, start, refresh))
+
+def search_leads_fanout(queries, api_key, locations=None, max_pages=SERP_MAX_PAGES,
+                        concurrency=SERP_CONCURRENCY, quota=SERP_QUOTA, client=None, refresh=False):
+    """
+    Run every query (crossed with every location, if given) and follow
+    result pagination up to `max_pages` per query.
+
+    Pages in the SerpAPI result cache are used directly unless `refresh`
+    is set. The rest are requested `concurrency` at a time, stopping once
+    `quota` SerpAPI calls have been made. Leads are deduplicated by place
+    id and canonical domain before being returned.
+    """
+    if isinstance(queries, str):
+        queries = [queries]
+    if locations:
+        queries = [f"{query} in {location}" for query in queries for location in locations]
+    # Queries differing only in case or spacing are the same search
+    queries = list({' '.join(q.lower().split()): q.strip() for q in queries if q and q.strip()}.values())
+
     leads = []
-    if "local_results" in results:
-        for result in results["local_results"]:
-            leads.append({
-                "name": result.get("title"),
-                "clinic_name": result.get("title"),
-                "website": result.get("website"),
-                "phone": result.get("phone")
-            })
+    seen_places = set()
+    seen_websites = set()
+    requests_made = 0
+    cached_pages = 0
+    ready = deque()
+    pending = {}
+
+    def fetch_page(query, page):
+        return _search_page(query, api_key, client, start=page * SERP_PAGE_SIZE, refresh=True)
+
+    def schedule(query, page):
+        nonlocal requests_made, cached_pages
+        if not refresh:
+            cached = serp_cache.get(_serp_cache_key(_search_params(query, page * SERP_PAGE_SIZE)))
+            if cached is not None:
+                cached_pages += 1
+                STAGE_EVENTS.inc(stage="serp_request", outcome="cached")
+                ready.append((query, page, cached))
+                return
+        if requests_made < quota:
+            pending[executor.submit(fetch_page, query, page)] = (query, page)
+            requests_made += 1
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        for query in queries:
+            schedule(query, 0)
+
+        while ready or pending:
+            if ready:
+                query, page, results = ready.popleft()
+            else:
+                future = next(as_completed(pending))
+                query, page = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"❌ Search failed for '{query}' page {page + 1}: {e}")
+                    continue
+
+            page_leads = _parse_local_results(results)
+            for lead in page_leads:
+                place_id = lead.get("place_id")
+                website = canonical_domain(lead.get("website"))
+                if (place_id and place_id in seen_places) or (website and website in seen_websites):
+                    continue
+                if place_id:
+                    seen_places.add(place_id)
+                if website:
+                    seen_websites.add(website)
+                leads.append(lead)
+
+            has_next = bool(results.get("serpapi_pagination", {}).get("next"))
+            if has_next and page_leads and page + 1 < max_pages:
+                schedule(query, page + 1)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"🔎 {len(queries)} queries, {requests_made} SerpAPI requests, {cached_pages} cached pages, "
+          f"{len(leads)} unique leads")
     return leads
 
-def extract_email_from_url(url):
+_robots_cache = {}
+_robots_lock = threading.Lock()
+_host_next_fetch = {}
+_host_lock = threading.Lock()
+
+def _cached_get(url):
+    """
+    (status, body) for a small file such as robots.txt, served from or
+    revalidated against the HTTP cache. Requests are spaced per host like page
+    fetches and the body is cut off at FETCH_MAX_BYTES; a cut-off body is
+    returned but not cached.
+    """
+    cached = http_cache.get(url)
+    if cached and cached['fresh']:
+        return 200, cached['body']
+    _wait_for_host(urlparse(url).netloc.lower())
+    headers = dict(FETCH_HEADERS, **http_cache.conditional_headers(cached))
+    with requests.get(url, timeout=FETCH_TIMEOUT, headers=headers, stream=True) as response:
+        if response.status_code == 304 and cached:
+            http_cache.refresh(url, response.headers)
+            return 200, cached['body']
+        body_parts = []
+        bytes_read = 0
+        complete = False
+        for chunk in response.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            body_parts.append(chunk)
+            if bytes_read >= FETCH_MAX_BYTES:
+                break
+        else:
+            complete = True
+        body = b''.join(body_parts)[:FETCH_MAX_BYTES]
+        if response.status_code == 200 and (complete or _read_whole_body(response)):
+            http_cache.store(url, response.headers, body)
+    return response.status_code, body
+
+def _robots_for(url):
+    """Parsed robots.txt for the url's host, fetched once per host"""
+    parsed = urlparse(url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    with _robots_lock:
+        robots = _robots_cache.get(origin)
+    if robots is not None:
+        return robots
+
+    robots = RobotFileParser()
+    try:
+        status, body = _cached_get(origin + '/robots.txt')
+        if status in (401, 403):
+            robots.disallow_all = True
+        elif status >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(body.decode('utf-8', 'ignore').splitlines())
+    except Exception:
+        robots.allow_all = True
+
+    with _robots_lock:
+        if len(_robots_cache) >= ROBOTS_CACHE_SIZE:
+            _robots_cache.clear()
+        _robots_cache[origin] = robots
+    return robots
+
+def _allowed(url):
+    return _robots_for(url).can_fetch(ROBOTS_USER_AGENT, url)
+
+def _wait_for_host(host, delay=CRAWL_HOST_DELAY):
+    """Sleep until `delay` seconds have passed since the last request to `host`"""
+    with _host_lock:
+        now = time.monotonic()
+        fetch_at = max(now, _host_next_fetch.get(host, 0))
+        _host_next_fetch[host] = fetch_at + delay
+        if len(_host_next_fetch) > ROBOTS_CACHE_SIZE:
+            for stale in [h for h, at in _host_next_fetch.items() if at < now]:
+                del _host_next_fetch[stale]
+    if fetch_at > now:
+        time.sleep(fetch_at - now)
+
+def _contact_links(page_text, page_url):
+    """Same-site links that look like contact/about pages, best first"""
+    site = base_domain(urlparse(page_url).netloc.split(':')[0])
+    ranked = {}
+    for match in LINK_RE.finditer(page_text):
+        href, label = match.group(1).strip(), match.group(2).lower()
+        link = urljoin(page_url, href).split('#')[0]
+        parsed = urlparse(link)
+        if parsed.scheme not in ('http', 'https'):
+            continue
+        if base_domain(parsed.netloc.split(':')[0]) != site:
+            continue
+        haystack = parsed.path.lower() + ' ' + label
+        for rank, keyword in enumerate(CONTACT_KEYWORDS):
+            if keyword in haystack:
+                ranked[link] = min(rank, ranked.get(link, rank))
+                break
+    return sorted(ranked, key=ranked.get)
+
+def _is_html(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return not content_type or content_type in FETCH_CONTENT_TYPES
+
+def _read_whole_body(response):
+    """True once every byte announced by Content-Length came off the wire"""
+    length = response.headers.get('Content-Length', '')
+    return length.isdigit() and response.raw.tell() >= int(length)
+
+def _scan_body(body, keep_text=False):
+    candidates = collect_candidates(body.decode('utf-8', 'ignore'), {})
+    return candidates, body.decode('utf-8', 'ignore') if keep_text else ''
+
+def _scan_page(url, website, keep_text=False, stop=None):
+    """
+    Stream one page and return (candidates, page_text).
+
+    Reading stops early once an address on `website`'s domain is seen or
+    `stop` is set. `page_text` is only kept when `keep_text` is true, for
+    link discovery. Pages come from the HTTP cache when fresh there, and
+    stale cached pages are revalidated with a conditional request.
+    """
+    cached = http_cache.get(url)
+    if cached and cached['fresh']:
+        STAGE_EVENTS.inc(stage="fetch", outcome="cached")
+        if not _is_html(cached['content_type']):
+            return {}, ''
+        return _scan_body(cached['body'], keep_text)
+
+    # Only requests that go out on the wire are spaced per host
+    _wait_for_host(urlparse(url).netloc.lower())
+    if stop is not None and stop.is_set():
+        return {}, ''
+
+    with track_stage("fetch"):
+        return _fetch_page(url, website, cached, keep_text, stop)
+
+def _fetch_page(url, website, cached, keep_text, stop):
+    candidates = {}
+    body_parts = []
+    headers = dict(FETCH_HEADERS, **http_cache.conditional_headers(cached))
+    with requests.get(url, timeout=FETCH_TIMEOUT, headers=headers, stream=True) as response:
+        if response.status_code == 304 and cached:
+            http_cache.refresh(url, response.headers)
+            STAGE_EVENTS.inc(stage="fetch", outcome="revalidated")
+            if not _is_html(cached['content_type']):
+                return {}, ''
+            return _scan_body(cached['body'], keep_text)
+
+        cacheable = response.status_code == 200
+        if not _is_html(response.headers.get('Content-Type')):
+            if cacheable:
+                # Remember the content type so the next run skips it without downloading
+                http_cache.store(url, response.headers, b'')
+            STAGE_EVENTS.inc(stage="fetch", outcome="skipped")
+            return candidates, ''
+
+        tail = b''
+        bytes_read = 0
+        complete = False
+        for chunk in response.iter_content(chunk_size=FETCH_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            body_parts.append(chunk)
+            data = tail + chunk
+            collect_candidates(data.decode('utf-8', 'ignore'), candidates, partial_end=True)
+            ranked = rank_candidates(candidates, website)
+            if ranked and ranked[0][1] >= HIGH_CONFIDENCE_SCORE:
+                tail = b''
+                break
+            if stop is not None and stop.is_set():
+                # Partial page; don't cache it
+                STAGE_EVENTS.inc(stage="fetch", outcome="cancelled")
+                return candidates, ''
+            tail = data[-CHUNK_OVERLAP:]
+            if bytes_read >= FETCH_MAX_BYTES:
+                break
+        else:
+            complete = True
+        complete = complete or _read_whole_body(response)
+        collect_candidates(tail.decode('utf-8', 'ignore'), candidates)
+        body = b''.join(body_parts)
+        # Pages cut short (high-confidence address, byte cap) are not cached:
+        # their validators would later vouch for the truncated body
+        if cacheable and complete:
+            http_cache.store(url, response.headers, body)
+    STAGE_EVENTS.inc(stage="fetch", outcome="success" if cacheable else f"http_{response.status_code}")
+    return candidates, body.decode('utf-8', 'ignore') if keep_text else ''
+
+def _crawl_url(url):
     if not url:
         return None
+    return url if '//' in url else 'http://' + url
+
+class _SiteCrawl:
+    """
+    Crawl state for one lead's website, advanced as its pages come back.
+
+    next_pages() hands out the next depth's pages and add_page() merges one
+    fetched page. The crawl is done once a high-confidence address turns up
+    or nothing is left to fetch; `email` then holds the best address found.
+    Whoever drives the crawl owns the threads that fetch its pages.
+    """
+
+    def __init__(self, url, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES):
+        self.url = url
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.candidates = {}
+        self.seen = {url}
+        self.frontier = [url] if url else []
+        self.depth = 0
+        self.pages_fetched = 0
+        self.in_flight = 0
+        self.stop = threading.Event()
+        self.done = False
+        self.email = None
+        self.started = time.perf_counter()
+
+    def next_pages(self):
+        """(page_url, keep_text) pairs for the next depth; [] while pages are out or once done"""
+        if self.done or self.in_flight:
+            return []
+        batch = self.frontier[:self.max_pages - self.pages_fetched] if self.depth <= self.max_depth else []
+        if not batch:
+            self._finish()
+            return []
+        self.pages_fetched += len(batch)
+        keep_text = self.depth < self.max_depth and self.pages_fetched < self.max_pages
+        self.depth += 1
+        self.frontier = []
+        self.in_flight = len(batch)
+        return [(page_url, keep_text) for page_url in batch]
+
+    def add_page(self, page_url, page_candidates, page_text):
+        self.in_flight -= 1
+        if self.done:
+            return
+        for email, info in page_candidates.items():
+            entry = self.candidates.setdefault(email, {'mailto': False})
+            entry['mailto'] = entry['mailto'] or info['mailto']
+        ranked = rank_candidates(self.candidates, self.url)
+        if ranked and ranked[0][1] >= HIGH_CONFIDENCE_SCORE:
+            self._finish()
+            return
+        for link in _contact_links(page_text, page_url) if page_text else []:
+            if link not in self.seen:
+                self.seen.add(link)
+                self.frontier.append(link)
+
+    def _finish(self):
+        self.done = True
+        # Pages still in flight stop reading
+        self.stop.set()
+        ranked = rank_candidates(self.candidates, self.url)
+        self.email = ranked[0][0] if ranked else None
+
+def _crawl_page(crawl, page_url, keep_text):
+    """(candidates, page_text) for one page of `crawl`, unless robots.txt disallows it"""
+    if not _allowed(page_url):
+        STAGE_EVENTS.inc(stage="fetch", outcome="robots_blocked")
+        return {}, ''
+    return _scan_page(page_url, crawl.url, keep_text, crawl.stop)
+
+def _page_result(future, page_url):
     try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Simple regex for finding emails
-        email_regex = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        emails = re.findall(email_regex, response.text)
-        
-        if emails:
-            # Filter out some common false positives if necessary
-            return emails[0]
-        
-        # Try finding in footer or contact page if not found on home page (simplified for now)
-        return None
+        return future.result()
     except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return None
+        print(f"Error scraping {page_url}: {e}")
+        return {}, ''
 
-def process_scraping_job(query, serp_api_key):
-    session = get_session()
-    raw_leads = search_leads(query, serp_api_key)
-    
-    new_leads_count = 0
-    for lead_data in raw_leads:
-        # Check if website already exists to avoid duplicates
-        existing = session.query(Lead).filter_by(website=lead_data['website']).first()
-        if existing:
-            continue
-            
-        lead = Lead(
-            name=lead_data['name'],
-            clinic_name=lead_data['clinic_name'],
-            website=lead_data['website'],
-            phone=lead_data['phone'],
-            status=LeadStatus.FOUND
-        )
-        session.add(lead)
-        new_leads_count += 1
-    
-    session.commit()
-    return new_leads_count
-
-def enrich_leads():
+def extract_email_from_url(url, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                           parallel=CRAWL_PARALLEL):
+    """
+    Return the best-ranked email address on a lead's website.
+
+    The home page is read first; if it has no address on the lead's own
+    domain, contact/about/impressum links are followed up to `max_depth`
+    hops and `max_pages` pages in total, fetched `parallel` at a time.
+    Pages disallowed by robots.txt are skipped, requests to one host are
+    spaced by CRAWL_HOST_DELAY, and the crawl stops at the first
+    high-confidence address.
+    """
+    crawl = _SiteCrawl(_crawl_url(url), max_depth, max_pages)
+    executor = ThreadPoolExecutor(max_workers=max(1, parallel))
+    try:
+        pages = crawl.next_pages()
+        while pages:
+            futures = {executor.submit(_crawl_page, crawl, page_url, keep_text): page_url
+                       for page_url, keep_text in pages}
+            for future in as_completed(futures):
+                crawl.add_page(futures[future], *_page_result(future, futures[future]))
+                if crawl.done:
+                    break
+            pages = crawl.next_pages()
+    finally:
+        crawl.stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return crawl.email
+
+def process_scraping_job(query, serp_api_key, locations=None, max_pages=SERP_MAX_PAGES,
+                         quota=SERP_QUOTA, client=None, refresh=False):
+    """Search one query or a list of queries (optionally crossed with locations) and ingest new leads"""
+    with track_stage("scrape"):
+        raw_leads = search_leads_fanout(query, serp_api_key, locations=locations, max_pages=max_pages,
+                                        quota=quota, client=client, refresh=refresh)
+        new_lead_ids, skipped = ingest_leads(raw_leads, return_ids=True)
+    print(f"📥 Ingested {len(new_lead_ids)} new leads, skipped {skipped} duplicates")
+    STAGE_EVENTS.inc(len(new_lead_ids), stage="scrape", outcome="new_lead")
+    STAGE_EVENTS.inc(skipped, stage="scrape", outcome="duplicate")
+    record_events(EventType.SCRAPED, new_lead_ids)
+    flush_events()
+    return len(new_lead_ids)
+
+def _host_of(url):
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ""
+
+def enrich_leads(max_workers=ENRICH_MAX_WORKERS, per_host=ENRICH_PER_HOST,
+                 deadline=ENRICH_DEADLINE, batch_size=ENRICH_BATCH_SIZE, on_progress=None,
+                 crawl_depth=CRAWL_MAX_DEPTH, crawl_pages=CRAWL_MAX_PAGES):
+    """
+    Fetch FOUND leads' websites concurrently and store the emails found.
+
+    Every page fetch of every lead runs on one pool of `max_workers` threads,
+    with at most `per_host` fetches against any single host at once; each
+    site is crawled for contact pages up to `crawl_depth` hops and
+    `crawl_pages` pages. Results are committed every `batch_size` leads as
+    they finish. Leads still pending when `deadline` seconds have passed stay
+    FOUND and are picked up by the next run. `on_progress(done, total)` is
+    called as leads finish.
+    """
     session = get_session()
-    leads_to_enrich = session.query(Lead).filter_by(status=LeadStatus.FOUND).all()
-    
+    leads_to_enrich = session.execute(
+        leads_in_status_query(LeadStatus.FOUND.value, Lead.id, Lead.website)).all()
+    if not leads_to_enrich:
+        session.close()
+        return 0
+
     enriched_count = 0
-    for lead in leads_to_enrich:
-        email = extract_email_from_url(lead.website)
-        if email:
-            lead.email = email
-            lead.status = LeadStatus.ENRICHED
+    done_count = 0
+    batch = []
+    started = time.monotonic()
+    QUEUE_DEPTH.set(len(leads_to_enrich), queue="enrich_pending")
+    if on_progress:
+        on_progress(0, len(leads_to_enrich))
+
+    def flush():
+        if batch:
+            session.bulk_update_mappings(Lead, batch)
+            session.commit()
+            mark_leads_changed()
+            record_events(EventType.ENRICHED, [row["id"] for row in batch if "email" in row])
+            batch.clear()
+
+    leads = iter(leads_to_enrich)
+    active = {}               # crawl -> lead_id, for leads being crawled
+    pending = []              # (crawl, page_url, keep_text) waiting for a worker
+    running = {}              # future -> (crawl, page_url, host)
+    host_in_flight = defaultdict(int)
+
+    def record(crawl):
+        nonlocal enriched_count, done_count
+        lead_id = active.pop(crawl)
+        STAGE_SECONDS.observe(time.perf_counter() - crawl.started, stage="extract")
+        STAGE_EVENTS.inc(stage="extract", outcome="found" if crawl.email else "not_found")
+        if crawl.email:
+            batch.append({"id": lead_id, "email": crawl.email, "status": LeadStatus.ENRICHED.value})
             enriched_count += 1
         else:
-            lead.status = LeadStatus.MISSING_INFO
-        
-    session.commit()
+            batch.append({"id": lead_id, "status": LeadStatus.MISSING_INFO.value})
+
+        if len(batch) >= batch_size:
+            flush()
+        done_count += 1
+        QUEUE_DEPTH.set(len(leads_to_enrich) - done_count, queue="enrich_pending")
+        if on_progress:
+            on_progress(done_count, len(leads_to_enrich))
+
+    def advance(crawl):
+        """Queue the crawl's next pages, or record its lead once it is done"""
+        pages = crawl.next_pages()
+        if crawl.done:
+            record(crawl)
+        pending.extend((crawl, page_url, keep_text) for page_url, keep_text in pages)
+
+    def start_work():
+        # Crawls are started lazily, so the queue never holds more than a
+        # pool's worth of leads
+        while len(active) < max_workers:
+            lead = next(leads, None)
+            if lead is None:
+                break
+            lead_id, website = lead
+            crawl = _SiteCrawl(_crawl_url(website), crawl_depth, crawl_pages)
+            active[crawl] = lead_id
+            advance(crawl)
+
+        waiting = []
+        for crawl, page_url, keep_text in pending:
+            if crawl.done:
+                continue
+            host = _host_of(page_url)
+            if len(running) >= max_workers or host_in_flight[host] >= per_host:
+                waiting.append((crawl, page_url, keep_text))
+                continue
+            host_in_flight[host] += 1
+            running[executor.submit(_crawl_page, crawl, page_url, keep_text)] = (crawl, page_url, host)
+        pending[:] = waiting
+        QUEUE_DEPTH.set(len(running), queue="enrich_in_flight")
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        start_work()
+        while running:
+            remaining = deadline - (time.monotonic() - started)
+            finished, _ = wait(running, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not finished:
+                print(f"⚠️ Enrichment deadline of {deadline}s reached after "
+                      f"{time.monotonic() - started:.0f}s, "
+                      f"{len(leads_to_enrich) - done_count} leads left as FOUND")
+                break
+            for future in finished:
+                crawl, page_url, host = running.pop(future)
+                host_in_flight[host] -= 1
+                if not host_in_flight[host]:
+                    del host_in_flight[host]
+                crawl.add_page(page_url, *_page_result(future, page_url))
+                if crawl in active and (crawl.done or not crawl.in_flight):
+                    advance(crawl)
+            start_work()
+    finally:
+        for crawl in active:
+            crawl.stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        QUEUE_DEPTH.set(0, queue="enrich_pending")
+        QUEUE_DEPTH.set(0, queue="enrich_in_flight")
+        flush()
+        session.close()
+        flush_events()
+
     return enriched_count
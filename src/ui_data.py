@@ -0,0 +1,118 @@
+"""
+Cached reads for the Streamlit pages.
+
+Every widget click reruns the page script, so pages read through these
+helpers instead of opening sessions themselves. Results are cached with
+`st.cache_data` and keyed on `leads_version()`, which the scraper, mailer
+and scheduler bump after every lead write (event charts use
+`events_version()`, bumped by the event log), so a write in any process
+shows up on the next rerun; the TTL only bounds how long an unchanged
+result is reused.
+"""
+from collections import namedtuple
+import streamlit as st
+from sqlalchemy import func, or_
+from src.database import Lead, LeadStatus, get_session, leads_version, events_version
+from src.analytics import get_status_counts, get_daily_sends, get_funnel
+
+# Seconds a query result may be reused while nothing was written
+UI_CACHE_TTL = 15
+
+# Rows per page offered by the lead grids
+LEAD_PAGE_SIZES = (25, 50, 100)
+
+FOLLOWUP_STATUSES = [
+    LeadStatus.CONTACTED.value,
+    LeadStatus.FOLLOWUP_1.value,
+    LeadStatus.FOLLOWUP_2.value,
+    LeadStatus.FOLLOWUP_3.value,
+]
+
+# Plain, picklable stand-in for a Lead row (attribute access like the ORM object)
+LeadRecord = namedtuple('LeadRecord', [
+    'id', 'name', 'clinic_name', 'website', 'email', 'phone', 'status',
+    'follow_up_count', 'last_contacted', 'created_at',
+])
+_RECORD_COLUMNS = [getattr(Lead, field) for field in LeadRecord._fields]
+
+def _query(build):
+    # Same engine and pool as every write in this process: Streamlit sets no
+    # DB_PROFILE, so src.database.engine uses the 'ui' profile
+    session = get_session()
+    try:
+        return build(session)
+    finally:
+        session.close()
+
+def _records(query):
+    return [LeadRecord(*row) for row in query.all()]
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _lead_count(version):
+    return _query(lambda session: session.query(func.count(Lead.id)).scalar())
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _status_counts(version):
+    return get_status_counts()
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _funnel(version):
+    return get_funnel()
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _daily_sends(version, days):
+    return get_daily_sends(days)
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _recent_leads(version, limit):
+    return _query(lambda session: _records(
+        session.query(*_RECORD_COLUMNS).order_by(Lead.created_at.desc()).limit(limit)
+    ))
+
+def _filtered(query, statuses, search, include_duplicates):
+    if not include_duplicates:
+        query = query.filter(Lead.duplicate_of.is_(None))
+    if statuses:
+        query = query.filter(Lead.status.in_(statuses))
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Lead.clinic_name.ilike(pattern), Lead.email.ilike(pattern)))
+    return query
+
+@st.cache_data(ttl=UI_CACHE_TTL, show_spinner=False)
+def _lead_page(version, statuses, search, page, page_size, include_duplicates):
+    def build(session):
+        total = _filtered(session.query(func.count(Lead.id)), statuses, search, include_duplicates).scalar()
+        rows = _records(
+            _filtered(session.query(*_RECORD_COLUMNS), statuses, search, include_duplicates)
+            .order_by(Lead.id).offset(page * page_size).limit(page_size)
+        )
+        return rows, total
+    return _query(build)
+
+def lead_count():
+    """Total leads, via COUNT(*)"""
+    return _lead_count(leads_version())
+
+def status_counts():
+    return _status_counts(leads_version())
+
+def funnel():
+    return _funnel(leads_version())
+
+def daily_sends(days=7):
+    return _daily_sends(events_version(), days)
+
+def recent_leads(limit=10):
+    """Newest leads as LeadRecords"""
+    return _recent_leads(leads_version(), limit)
+
+def lead_page(statuses=None, search='', page=0, page_size=LEAD_PAGE_SIZES[0], include_duplicates=True):
+    """
+    One page of LeadRecords matching `statuses` (any status when empty) and a
+    clinic name / email substring, oldest first, plus the total match count.
+    Filtering, counting and paging all happen in SQL. Outreach views pass
+    include_duplicates=False to skip leads marked `duplicate_of` another.
+    """
+    return _lead_page(leads_version(), tuple(statuses or ()), search.strip(), page, page_size,
+                      include_duplicates)
@@ -1,5 +1,6 @@
 // ===== Global State =====
 let allLeads = [];
+let leadsCursor = null;
 let currentLeadId = null;
 let bulkPreviews = {};
 
@@ -95,20 +96,37 @@ emailModal.querySelector('.modal-overlay').addEventListener('click', () => {
 });
 
 // ===== API Functions =====
-async function fetchLeads() {
+async function fetchLeads({ status = '', q = '', after = null, limit = 100, fields = '' } = {}) {
     try {
-        const response = await fetch(`${API_BASE}/leads`);
+        const params = new URLSearchParams({ limit });
+        if (status) params.set('status', status);
+        if (q) params.set('q', q);
+        if (after !== null) params.set('after', after);
+        if (fields) params.set('fields', fields);
+
+        const response = await fetch(`${API_BASE}/leads?${params}`);
         if (!response.ok) throw new Error('Failed to fetch leads');
         const data = await response.json();
-        allLeads = data.leads || [];
-        return allLeads;
+        return { leads: data.leads || [], nextCursor: data.next_cursor };
     } catch (error) {
         console.error('Error fetching leads:', error);
         showToast('Failed to load leads', 'error');
-        return [];
+        return { leads: [], nextCursor: null };
     }
 }
 
+async function fetchAllLeads(options = {}) {
+    // Follow the keyset cursor until the filtered result set is exhausted
+    let leads = [];
+    let after = null;
+    do {
+        const page = await fetchLeads({ ...options, after, limit: 500 });
+        leads = leads.concat(page.leads);
+        after = page.nextCursor;
+    } while (after !== null);
+    return leads;
+}
+
 async function previewEmail(leadId) {
     try {
         const response = await fetch(`${API_BASE}/preview-email`, {
@@ -141,22 +159,40 @@ async function sendEmail(leadId, subject, body) {
     }
 }
 
-async function bulkPreview() {
+async function bulkPreview(onPreview, onTotal = () => {}) {
+    // Read the NDJSON stream and hand over each preview as soon as it arrives
     try {
-        const response = await fetch(`${API_BASE}/bulk-preview`, {
+        const response = await fetch(`${API_BASE}/bulk-preview?stream=1`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' }
         });
         if (!response.ok) throw new Error('Failed to generate bulk preview');
-        return await response.json();
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const message = JSON.parse(line);
+                if (message.lead_id !== undefined) onPreview(message);
+                else if (message.total !== undefined) onTotal(message.total);
+            }
+        }
+        return true;
     } catch (error) {
         console.error('Error generating bulk preview:', error);
         showToast('Failed to generate bulk preview', 'error');
-        return null;
+        return false;
     }
 }
 
-async function bulkSend(selectedLeads) {
+async function bulkSend(selectedLeads, onProgress) {
     try {
         const response = await fetch(`${API_BASE}/bulk-send`, {
             method: 'POST',
@@ -164,7 +200,10 @@ async function bulkSend(selectedLeads) {
             body: JSON.stringify({ lead_ids: selectedLeads })
         });
         if (!response.ok) throw new Error('Failed to send bulk emails');
-        return await response.json();
+        const { job_id } = await response.json();
+        const job = await waitForJob(job_id, onProgress);
+        if (job.status !== 'succeeded') return { success: false, error: job.error };
+        return { success: true, ...job.result };
     } catch (error) {
         console.error('Error sending bulk emails:', error);
         showToast('Failed to send bulk emails', 'error');
@@ -187,7 +226,7 @@ async function runScheduler() {
     }
 }
 
-async function runScraper(query) {
+async function runScraper(query, onProgress) {
     try {
         const response = await fetch(`${API_BASE}/run-scraper`, {
             method: 'POST',
@@ -195,7 +234,10 @@ async function runScraper(query) {
             body: JSON.stringify({ query })
         });
         if (!response.ok) throw new Error('Failed to start scraper');
-        return await response.json();
+        const { job_id } = await response.json();
+        const job = await waitForJob(job_id, onProgress);
+        if (job.status !== 'succeeded') return { success: false, error: job.error };
+        return { success: true, ...job.result };
     } catch (error) {
         console.error('Error starting scraper:', error);
         showToast('Failed to start scraper', 'error');
@@ -203,6 +245,18 @@ async function runScraper(query) {
     }
 }
 
+async function waitForJob(jobId, onProgress = () => {}) {
+    // Poll a background job until it finishes; resolves with the job record
+    while (true) {
+        const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+        if (!response.ok) throw new Error('Failed to fetch job status');
+        const { job } = await response.json();
+        onProgress(job);
+        if (!['queued', 'running'].includes(job.status)) return job;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 async function fetchAnalytics() {
     try {
         const response = await fetch(`${API_BASE}/analytics`);
@@ -216,25 +270,38 @@ async function fetchAnalytics() {
 }
 
 // ===== Dashboard Functions =====
+function countStatuses(statusCounts, names) {
+    return Object.entries(statusCounts)
+        .filter(([status]) => names.includes(status.toUpperCase()))
+        .reduce((sum, [, count]) => sum + count, 0);
+}
+
 async function loadDashboard() {
-    const leads = await fetchLeads();
+    const analytics = await fetchAnalytics();
+    const statusCounts = (analytics && analytics.status_counts) || {};
 
     // Update stats
-    document.getElementById('totalLeads').textContent = leads.length;
+    document.getElementById('totalLeads').textContent =
+        Object.values(statusCounts).reduce((sum, count) => sum + count, 0);
 
-    const contacted = leads.filter(l =>
-        ['CONTACTED', 'FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3'].includes(l.status)
-    ).length;
+    const contacted = countStatuses(statusCounts, ['CONTACTED', 'FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3']);
     document.getElementById('contacted').textContent = contacted;
     document.getElementById('emailsSent').textContent = contacted;
 
-    const followups = leads.filter(l =>
-        ['FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3'].includes(l.status)
-    ).length;
+    const followups = countStatuses(statusCounts, ['FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3']);
     document.getElementById('followups').textContent = followups;
 
-    // Render leads table
-    renderLeadsTable(leads);
+    // Render first page of the leads table
+    await loadLeadsPage(true);
+}
+
+async function loadLeadsPage(reset = false) {
+    const status = document.getElementById('statusFilter').value;
+    const page = await fetchLeads({ status, after: reset ? null : leadsCursor });
+
+    allLeads = reset ? page.leads : allLeads.concat(page.leads);
+    leadsCursor = page.nextCursor;
+    renderLeadsTable(allLeads);
 }
 
 function renderLeadsTable(leads) {
@@ -268,13 +335,21 @@ function renderLeadsTable(leads) {
         }
             </td>
         </tr>
-    `).join('');
+    `).join('') + (leadsCursor !== null ? `
+        <tr>
+            <td colspan="7" style="text-align: center;">
+                <button class="btn btn-secondary" onclick="loadLeadsPage()">Load more</button>
+            </td>
+        </tr>
+    ` : '');
 }
 
 // ===== Campaign Functions =====
 async function loadCampaign() {
-    const leads = await fetchLeads();
-    const enrichedLeads = leads.filter(l => l.status === 'ENRICHED');
+    const [enrichedLeads, ...followupPages] = await Promise.all([
+        fetchAllLeads({ status: 'ENRICHED' }),
+        ...['CONTACTED', 'FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3'].map(status => fetchAllLeads({ status }))
+    ]);
 
     // Individual tab
     renderIndividualLeads(enrichedLeads);
@@ -283,10 +358,7 @@ async function loadCampaign() {
     document.getElementById('bulkLeadCount').textContent = `${enrichedLeads.length} leads`;
 
     // Follow-ups tab
-    const followupLeads = leads.filter(l =>
-        ['CONTACTED', 'FOLLOWUP_1', 'FOLLOWUP_2', 'FOLLOWUP_3'].includes(l.status)
-    );
-    renderFollowupLeads(followupLeads);
+    renderFollowupLeads(followupPages.flat());
 }
 
 function renderIndividualLeads(leads) {
@@ -407,23 +479,24 @@ document.getElementById('previewAllBtn').addEventListener('click', async () => {
     btn.disabled = true;
     btn.innerHTML = '<div class="loading-spinner"></div> Generating...';
 
-    const previews = await bulkPreview();
+    bulkPreviews = {};
+    document.getElementById('bulkLeadsList').innerHTML = '';
+    document.getElementById('bulkPreviewContainer').style.display = 'block';
+    updateSelectedCount();
+
+    let total = 0;
+    await bulkPreview(preview => {
+        bulkPreviews[preview.lead_id] = preview;
+        appendBulkPreview(preview.lead_id, preview);
+        btn.innerHTML = `<div class="loading-spinner"></div> Generating ${Object.keys(bulkPreviews).length} of ${total}...`;
+    }, count => { total = count; });
 
     btn.disabled = false;
     btn.innerHTML = '🔍 Preview All Emails';
-
-    if (previews && previews.previews) {
-        bulkPreviews = previews.previews;
-        renderBulkPreviews(previews.previews);
-        document.getElementById('bulkPreviewContainer').style.display = 'block';
-    }
 });
 
-function renderBulkPreviews(previews) {
-    const container = document.getElementById('bulkLeadsList');
-    const previewArray = Object.entries(previews);
-
-    container.innerHTML = previewArray.map(([leadId, data]) => `
+function bulkPreviewCard(leadId, data) {
+    return `
         <div class="card" style="margin-bottom: 1rem;">
             <label style="display: flex; align-items: start; gap: 1rem; cursor: pointer;">
                 <input type="checkbox" class="bulk-checkbox" data-lead-id="${leadId}" checked style="margin-top: 0.25rem;">
@@ -440,14 +513,15 @@ function renderBulkPreviews(previews) {
                 </div>
             </label>
         </div>
-    `).join('');
+    `;
+}
 
+function appendBulkPreview(leadId, data) {
+    const container = document.getElementById('bulkLeadsList');
+    container.insertAdjacentHTML('beforeend', bulkPreviewCard(leadId, data));
+    container.lastElementChild.querySelector('.bulk-checkbox')
+        .addEventListener('change', updateSelectedCount);
     updateSelectedCount();
-
-    // Add event listeners to checkboxes
-    document.querySelectorAll('.bulk-checkbox').forEach(checkbox => {
-        checkbox.addEventListener('change', updateSelectedCount);
-    });
 }
 
 function updateSelectedCount() {
@@ -474,19 +548,15 @@ document.getElementById('sendAllBtn').addEventListener('click', async () => {
     const progressPercent = document.getElementById('progressPercent');
     const progressText = document.getElementById('progressText');
 
-    // Simulate progress (in real implementation, this would be updated via API)
-    let progress = 0;
-    const interval = setInterval(() => {
-        progress += 10;
-        if (progress <= 90) {
-            progressFill.style.width = `${progress}%`;
-            progressPercent.textContent = `${progress}%`;
-        }
-    }, 300);
-
-    const result = await bulkSend(selectedLeadIds);
+    const result = await bulkSend(selectedLeadIds, job => {
+        const progress = job.total ? Math.round(job.done / job.total * 100) : 0;
+        progressFill.style.width = `${progress}%`;
+        progressPercent.textContent = `${progress}%`;
+        progressText.textContent = job.eta_seconds !== null
+            ? `${job.done} of ${job.total} sent, about ${Math.ceil(job.eta_seconds)}s left`
+            : `${job.done} of ${job.total} sent`;
+    });
 
-    clearInterval(interval);
     progressFill.style.width = '100%';
     progressPercent.textContent = '100%';
 
@@ -549,28 +619,18 @@ document.getElementById('runScraperBtn').addEventListener('click', async () => {
     progress.style.display = 'block';
     consoleOut.innerHTML = `<div class="log-line">Starting scraper for: "${query}"...</div>`;
 
-    // Simulate real-time logs (since we don't have websocket set up yet)
-    let logs = [
-        "Initializing Google Search scraper...",
-        "Searching for leads...",
-        "Found potential leads...",
-        "Extracting contact information...",
-        "Verifying email addresses...",
-        "Saving leads to database..."
-    ];
-
-    let i = 0;
-    const logInterval = setInterval(() => {
-        if (i < logs.length) {
-            consoleOut.innerHTML += `<div class="log-line">${logs[i]}</div>`;
+    let lastLogged = null;
+    const result = await runScraper(query, job => {
+        const line = job.total
+            ? `Enriching leads: ${job.done} of ${job.total} websites checked...`
+            : 'Searching for leads...';
+        if (line !== lastLogged) {
+            consoleOut.innerHTML += `<div class="log-line">${line}</div>`;
             consoleOut.scrollTop = consoleOut.scrollHeight;
-            i++;
+            lastLogged = line;
         }
-    }, 1500);
-
-    const result = await runScraper(query);
+    });
 
-    clearInterval(logInterval);
     btn.disabled = false;
 
     if (result.success) {
@@ -589,8 +649,9 @@ async function loadAnalytics() {
     if (!data) return;
 
     // Update stats
-    document.getElementById('analyticsResponseRate').textContent = '12.5%'; // active placeholder
-    document.getElementById('analyticsConversionRate').textContent = '3.2%'; // active placeholder
+    const funnel = data.funnel || {};
+    document.getElementById('analyticsResponseRate').textContent = formatPercent(funnel.reply_rate);
+    document.getElementById('analyticsConversionRate').textContent = formatPercent(funnel.reach_rate);
 
     // Render Charts
     renderStatusChart(data.status_counts);
@@ -623,10 +684,9 @@ function renderStatusChart(statusCounts) {
 }
 
 function renderPerformanceChart(dailyStats) {
-    // Placeholder data if no real history exists
-    const dates = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
-    const sent = [5, 12, 8, 15, 10, 4, 2];
-    const opened = [2, 6, 4, 8, 5, 2, 1];
+    const dates = dailyStats.dates;
+    const sent = dailyStats.sent;
+    const opened = dailyStats.opened;
 
     const trace1 = {
         x: dates,
@@ -658,10 +718,8 @@ function renderPerformanceChart(dailyStats) {
 }
 
 // ===== Status Filter =====
-document.getElementById('statusFilter').addEventListener('change', (e) => {
-    const status = e.target.value;
-    const filtered = status ? allLeads.filter(l => l.status === status) : allLeads;
-    renderLeadsTable(filtered);
+document.getElementById('statusFilter').addEventListener('change', () => {
+    loadLeadsPage(true);
 });
 
 // ===== Utility Functions =====
@@ -670,6 +728,10 @@ function truncate(str, length) {
     return str.length > length ? str.substring(0, length) + '...' : str;
 }
 
+function formatPercent(rate) {
+    return `${((rate || 0) * 100).toFixed(1)}%`;
+}
+
 function formatDate(dateStr) {
     if (!dateStr) return 'Never';
     const date = new Date(dateStr);